@@ -4,10 +4,45 @@ Manejador global de excepciones DRF con formato consistente.
 
 from __future__ import annotations
 
-from rest_framework.views import exception_handler
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler, set_rollback
+
+from inventory.core.api_responses import validation_error_payload
+from inventory.core.constants import INSUFFICIENT_STOCK_CODE
+
+
+def _validation_error_codes(exc):
+    if hasattr(exc, "error_dict"):
+        return {error.code for errors in exc.error_dict.values() for error in errors}
+    return {error.code for error in exc.error_list}
+
+
+def django_validation_error_response(exc, context):
+    """
+    Traduce un ValidationError de Django (servicios y modelos) a una respuesta 400/409.
+
+    Responde 409 si algún error trae code=INSUFFICIENT_STOCK_CODE (falta de stock
+    es un conflicto, no un dato inválido). El código y detalle por defecto del
+    payload salen de `validation_error_defaults` de la vista para la acción en curso
+    (p. ej. {"confirm": {"default_code": "SALE_CONFIRMATION_FAILED", ...}}).
+    """
+    view = context.get("view")
+    defaults = getattr(view, "validation_error_defaults", {}).get(getattr(view, "action", None), {})
+    payload = validation_error_payload(exc, **defaults)
+    is_stock_conflict = INSUFFICIENT_STOCK_CODE in _validation_error_codes(exc)
+    set_rollback()
+    return Response(
+        payload,
+        status=status.HTTP_409_CONFLICT if is_stock_conflict else status.HTTP_400_BAD_REQUEST,
+    )
 
 
 def custom_exception_handler(exc, context):
+    if isinstance(exc, DjangoValidationError):
+        return django_validation_error_response(exc, context)
+
     response = exception_handler(exc, context)
     if response is None:
         return response
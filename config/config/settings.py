@@ -95,6 +95,34 @@ if os.getenv('USE_IN_MEMORY_CHANNEL_LAYER', 'False').lower() == 'true':
         },
     }
 
+# ─── Caché ───────────────────────────────────────────────────────────────────
+# Debe ser compartida entre procesos (gunicorn --workers 2): los permisos,
+# usuarios JWT y versiones de ETag cacheados se invalidan con signals, y esa
+# invalidación tiene que verse en todos los workers. Usa el Redis de Channels
+# en otra base lógica.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://{host}:{port}/{db}'.format(
+            host=os.getenv('REDIS_HOST', '127.0.0.1'),
+            port=os.getenv('REDIS_PORT', 6379),
+            db=os.getenv('REDIS_CACHE_DB', 1),
+        ),
+    },
+}
+# LocMemCache es por proceso: solo para un único proceso local sin Redis
+if os.getenv('USE_LOCAL_MEMORY_CACHE', 'False').lower() == 'true':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+_SHARED_CACHE = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+# Respuestas 304 de ConditionalGetMixin: las versiones de ETag viven en la caché,
+# así que sin caché compartida un worker respondería 304 con datos ya cambiados
+CONDITIONAL_GET_ENABLED = _SHARED_CACHE
+
 # ─── Contraseñas ─────────────────────────────────────────────────────────────
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -121,11 +149,18 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # ─── Django REST Framework ───────────────────────────────────────────────────
+# El usuario del token solo se cachea entre requests con la caché compartida:
+# con LocMemCache un usuario desactivado seguiría autenticando en otros workers
+_JWT_AUTHENTICATION = (
+    'inventory.core.authentication.CachedJWTAuthentication' if _SHARED_CACHE
+    else 'rest_framework_simplejwt.authentication.JWTAuthentication'
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'EXCEPTION_HANDLER': 'config.exceptions.custom_exception_handler',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        _JWT_AUTHENTICATION,
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
@@ -20,6 +20,17 @@ DATABASES = {
     }
 }
 
+# ─── Caché en memoria ────────────────────────────────────────────────────────
+# runserver es un solo proceso: todas sus requests ven la misma LocMemCache,
+# así que los permisos, el usuario JWT y las versiones de ETag se siguen
+# invalidando bien sin Redis (REST_FRAMEWORK y CONDITIONAL_GET_ENABLED se
+# heredan tal como quedan con la caché compartida de base)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 # ─── CORS permisivo en dev ───────────────────────────────────────────────────
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
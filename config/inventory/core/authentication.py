@@ -0,0 +1,39 @@
+"""
+Autenticación JWT con caché del usuario del token
+"""
+from django.core.cache import cache
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .constants import JWT_USER_CACHE_KEY, JWT_USER_CACHE_TTL
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que evita el SELECT de auth_user en cada request.
+
+    La firma y expiración del token se validan siempre; solo se cachea el
+    usuario resuelto durante JWT_USER_CACHE_TTL. users/signals.py invalida la
+    entrada cuando el usuario se guarda o se elimina (cambio de contraseña,
+    desactivación, etc.). settings.py solo la activa con la caché compartida
+    (Redis); con una caché por proceso la invalidación no llegaría a los demás
+    workers.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache_key = JWT_USER_CACHE_KEY.format(user_id=user_id)
+        user = cache.get(cache_key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(cache_key, user, JWT_USER_CACHE_TTL)
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    """Documenta CachedJWTAuthentication igual que JWTAuthentication en el schema OpenAPI."""
+    target_class = "inventory.core.authentication.CachedJWTAuthentication"
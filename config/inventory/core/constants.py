@@ -6,3 +6,26 @@ Constantes utilizadas en Golos Inventory
 GROUP_SALES = "Sales"
 GROUP_INVENTORY = "Inventory"
 GROUP_MANAGERS = "Managers"
+
+# Caché del catálogo de permisos - Usado en users/views.py y users/signals.py
+PERMISSION_CATALOG_CACHE_KEY = "perm_catalog:inventory:v1"
+PERMISSION_CATALOG_CACHE_TTL = 300  # segundos
+
+# Caché de nombres de grupo por usuario - Usado en users/serializers.py y users/signals.py
+USER_GROUPS_CACHE_KEY = "user:groups:{user_id}"
+USER_GROUPS_CACHE_TTL = 60  # segundos
+
+# Caché de permisos efectivos por usuario - Usado en core/permissions.py y users/signals.py
+USER_PERMISSIONS_CACHE_KEY = "perms:{user_id}"
+USER_PERMISSIONS_CACHE_TTL = 300  # segundos
+
+# Versión de los recursos de lectura para ETag - Usado en core/http_cache.py, core/signals.py y users/signals.py
+RESOURCE_VERSION_CACHE_KEY = "resource_version:{label}"
+RESOURCE_VERSION_CACHE_TTL = 60  # segundos; acota lo que puede durar una versión no invalidada
+
+# Caché del usuario autenticado por JWT - Usado en core/authentication.py y users/signals.py
+JWT_USER_CACHE_KEY = "jwt:user:{user_id}"
+JWT_USER_CACHE_TTL = 60  # segundos
+
+# Código de los ValidationError por falta de stock: el handler global responde 409 - Usado en core/services.py, store/views.py y config/exceptions.py
+INSUFFICIENT_STOCK_CODE = "insufficient_stock"
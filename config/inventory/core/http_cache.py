@@ -0,0 +1,94 @@
+"""
+GET condicionales (ETag / 304) para ViewSets de lectura frecuente
+"""
+import hashlib
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .constants import RESOURCE_VERSION_CACHE_KEY, RESOURCE_VERSION_CACHE_TTL
+
+
+def _version_key(model):
+    return RESOURCE_VERSION_CACHE_KEY.format(label=model._meta.label_lower)
+
+
+def model_versions(models):
+    """
+    Obtener la versión actual de cada modelo, creándola si no existe.
+
+    Args:
+        models: Modelos de los que depende la respuesta
+
+    Returns:
+        list: Versiones en el mismo orden que models
+    """
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, RESOURCE_VERSION_CACHE_TTL)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_model_versions(*models):
+    """
+    Invalida los ETag que dependen de estos modelos.
+
+    Los signals de core/ y users/ lo llaman al guardar o eliminar; las
+    escrituras masivas (bulk_create, update) deben llamarlo explícitamente.
+
+    La invalidación corre al confirmar la transacción: antes, un GET
+    concurrente podría cachear la versión nueva junto con las filas viejas
+    y responder 304 obsoletos hasta RESOURCE_VERSION_CACHE_TTL.
+    """
+    keys = [_version_key(model) for model in models]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class ConditionalGetMixin:
+    """
+    Responde 304 Not Modified en list/retrieve si el cliente ya tiene la versión actual.
+
+    La autenticación y los permisos se validan igual (corren en initial()
+    antes del handler); en un acierto solo se evita consultar y serializar.
+    No se usa cache_page: su caché no distingue usuarios y saltaría los permisos.
+
+    Las versiones viven en la caché por defecto; con CONDITIONAL_GET_ENABLED
+    apagado (caché por proceso) se responde siempre completo y sin ETag.
+    """
+
+    # Modelos cuyo cambio invalida la respuesta
+    etag_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(super().retrieve, request, *args, **kwargs)
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        if not settings.CONDITIONAL_GET_ENABLED:
+            return handler(request, *args, **kwargs)
+
+        # La versión se lee antes que los datos: el ETag nunca es más nuevo que la respuesta
+        fingerprint = "|".join([*model_versions(self.etag_models), request.get_full_path()])
+        etag = quote_etag(hashlib.md5(fingerprint.encode()).hexdigest())
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+        response["ETag"] = etag
+        # Datos de usuarios autenticados: sin cachés compartidas y revalidando siempre
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
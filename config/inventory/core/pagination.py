@@ -0,0 +1,25 @@
+"""
+Paginaciones por tamaño de fila para los ViewSets
+"""
+from rest_framework.pagination import PageNumberPagination
+
+
+class SmallPage(PageNumberPagination):
+    """
+    Páginas cortas para filas costosas de serializar (URLs de imagen) o
+    listados que crecen sin límite (movimientos de inventario).
+    """
+
+    page_size = 25
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class BigPage(PageNumberPagination):
+    """
+    Páginas largas para catálogos que el frontend carga completos (selectores de variantes).
+    """
+
+    page_size = 200
+    page_size_query_param = "page_size"
+    max_page_size = 500
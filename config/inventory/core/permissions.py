@@ -0,0 +1,81 @@
+"""
+Permisos de modelo con caché de los permisos efectivos del usuario
+"""
+from functools import lru_cache
+
+from django.core.cache import cache
+from rest_framework.permissions import DjangoModelPermissions
+
+from .constants import USER_PERMISSIONS_CACHE_KEY, USER_PERMISSIONS_CACHE_TTL
+
+
+def cached_user_permissions(user):
+    """
+    Obtener los permisos efectivos ("app_label.codename") de un usuario.
+
+    Evita el JOIN de auth_user_groups/auth_group_permissions/auth_permission
+    entre requests; users/signals.py invalida la entrada cuando cambian los
+    grupos o permisos del usuario. Requiere la caché compartida de settings
+    (Redis): con una caché por proceso la invalidación no llegaría a los
+    demás workers y un permiso revocado seguiría vigente en ellos.
+
+    Args:
+        user: Instancia de User
+
+    Returns:
+        set: Permisos del usuario
+    """
+    return cache.get_or_set(
+        USER_PERMISSIONS_CACHE_KEY.format(user_id=user.pk),
+        lambda: set(user.get_all_permissions()),
+        USER_PERMISSIONS_CACHE_TTL,
+    )
+
+
+class CachedDjangoModelPermissions(DjangoModelPermissions):
+    """
+    DjangoModelPermissions que consulta los permisos cacheados del usuario
+    en lugar de user.has_perms().
+    """
+
+    def has_permission(self, request, view):
+        if not request.user or (
+            not request.user.is_authenticated and self.authenticated_users_only
+        ):
+            return False
+
+        # Igual que DRF: la vista raíz del DefaultRouter no aplica permisos de modelo
+        if getattr(view, "_ignore_model_permissions", False):
+            return True
+
+        queryset = self._queryset(view)
+        perms = self.get_required_permissions(request.method, queryset.model)
+        if not perms:
+            return True
+
+        user = request.user
+        # Mismo atajo que ModelBackend.has_perm
+        if not user.is_active:
+            return False
+        if user.is_superuser:
+            return True
+        return set(perms) <= cached_user_permissions(user)
+
+
+@lru_cache(maxsize=None)
+def _permission_instances(permission_classes):
+    return tuple(permission() for permission in permission_classes)
+
+
+class SharedPermissionInstancesMixin:
+    """
+    Reutiliza las instancias de permission_classes entre requests en lugar
+    de instanciarlas en cada get_permissions().
+
+    Solo apto para permisos sin estado (IsAuthenticated, AllowAny,
+    CachedDjangoModelPermissions...). Respeta los permission_classes
+    propios de cada @action porque la caché se indexa por las clases.
+    """
+
+    def get_permissions(self):
+        return _permission_instances(tuple(self.permission_classes))
@@ -0,0 +1,106 @@
+"""
+Carga automática de relaciones según el serializer activo
+"""
+
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _walk_relations(model, attrs, prefix, in_prefetch, select, prefetch):
+    """
+    Recorrer `attrs` sobre el modelo y anotar cada tramo que es una relación.
+
+    Returns:
+        tuple or None: (modelo final, ruta, in_prefetch) si todos los tramos son relaciones
+    """
+    path = prefix
+    for attr in attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.is_relation:
+            return None
+        path = f"{path}__{attr}" if path else attr
+        # Desde la primera relación a muchos, lo que cuelga de ella también se prefetchea
+        in_prefetch = in_prefetch or field.many_to_many or field.one_to_many
+        (prefetch if in_prefetch else select).append(path)
+        model = field.related_model
+    return model, path, in_prefetch
+
+
+def _collect_relations(serializer, model, prefix, in_prefetch, select, prefetch):
+    for field in serializer.fields.values():
+        attrs = getattr(field, "source_attrs", [])
+        if not attrs or isinstance(field, serializers.SerializerMethodField):
+            continue
+
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if isinstance(nested, serializers.BaseSerializer):
+            walked = _walk_relations(model, attrs, prefix, in_prefetch, select, prefetch)
+            if walked is not None and hasattr(nested, "Meta"):
+                _collect_relations(nested, *walked, select, prefetch)
+        elif isinstance(field, (serializers.ManyRelatedField, serializers.RelatedField)) and not isinstance(
+            field, serializers.PrimaryKeyRelatedField
+        ):
+            _walk_relations(model, attrs, prefix, in_prefetch, select, prefetch)
+        else:
+            # El último tramo es una columna (o el id de la FK): basta con cargar el camino hasta ella
+            _walk_relations(model, attrs[:-1], prefix, in_prefetch, select, prefetch)
+
+
+@lru_cache(maxsize=None)
+def serializer_relation_lookups(serializer_class):
+    """
+    Relaciones que recorre un ModelSerializer al serializar, según los `source` de sus campos.
+
+    Las FK y OneToOne van a select_related; las relaciones a muchos (FK inversa
+    y M2M) y todo lo que cuelga de ellas, a prefetch_related. Los
+    SerializerMethodField no se pueden inspeccionar y se ignoran.
+
+    Args:
+        serializer_class: Clase de ModelSerializer
+
+    Returns:
+        tuple: (rutas para select_related, rutas para prefetch_related)
+    """
+    select, prefetch = [], []
+    _collect_relations(serializer_class(), serializer_class.Meta.model, "", False, select, prefetch)
+    return tuple(dict.fromkeys(select)), tuple(dict.fromkeys(prefetch))
+
+
+class AutoPrefetchViewSetMixin:
+    """
+    Aplica select_related/prefetch_related según lo que recorre el serializer activo.
+
+    Se aplica en filter_queryset, después del get_queryset de cada ViewSet, para
+    que los Prefetch escritos a mano (filtrados, ordenados o con to_attr) tengan
+    prioridad: las rutas que ya cubren no se vuelven a pedir.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        select, prefetch = serializer_relation_lookups(self.get_serializer_class())
+
+        prefetched, traversed = set(), set()
+        for lookup in queryset._prefetch_related_lookups:
+            through = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+            parts = through.split("__")
+            prefetched.add(through)
+            traversed.update("__".join(parts[:index]) for index in range(1, len(parts) + 1))
+
+        # Repetir una ruta ya recorrida choca con el Prefetch a mano; una FK que ese
+        # Prefetch solo atraviesa sí puede ir por JOIN, salvo que esté bajo una ruta prefetcheada
+        prefetch = [path for path in prefetch if path not in traversed]
+        select = [
+            path for path in select
+            if not any(path == done or path.startswith(f"{done}__") for done in prefetched)
+        ]
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        if select and queryset.query.select_related is not True:
+            queryset = queryset.select_related(*select)
+        return queryset
@@ -0,0 +1,101 @@
+"""
+Utilidades compartidas para serializers
+"""
+import copy
+
+# Campos construidos por clase de serializer - Usado en CachedFieldsMixin
+_FIELDS_BY_SERIALIZER = {}
+
+
+class CachedFieldsMixin:
+    """
+    Construye los campos de un ModelSerializer una sola vez por clase.
+
+    ModelSerializer.get_fields() introspecciona el modelo y arma cada campo en
+    cada instancia; los serializers que se instancian por fila (variantes,
+    imágenes) repiten ese trabajo. Se guarda el resultado de la primera
+    construcción y cada instancia recibe una copia profunda, igual que DRF
+    hace con los campos declarados: los campos se enlazan (bind) a su
+    serializer padre, así que no pueden compartirse entre instancias.
+
+    Solo apto para serializers cuyos campos no dependen del contexto ni de
+    la instancia.
+    """
+
+    def get_fields(self):
+        serializer_class = type(self)
+        fields = _FIELDS_BY_SERIALIZER.get(serializer_class)
+        if fields is None:
+            fields = _FIELDS_BY_SERIALIZER[serializer_class] = super().get_fields()
+        return copy.deepcopy(fields)
+
+
+def serializer_model_columns(serializer_class):
+    """
+    Columnas del modelo que lee un ModelSerializer, para limitar el SELECT con only().
+
+    Incluye los campos de Meta.fields que son columnas del modelo y el primer
+    tramo del `source` de los campos declarados (p. ej. "product" para
+    source="product.name"). Los SerializerMethodField no se pueden inspeccionar:
+    lo que lean debe estar en Meta.fields.
+
+    Args:
+        serializer_class: Clase de ModelSerializer
+
+    Returns:
+        list or None: Nombres de campo, o None si el serializer usa "__all__"
+    """
+    meta = serializer_class.Meta
+    fields = getattr(meta, "fields", None)
+    if fields is None or fields == "__all__":
+        return None
+
+    columns = {field.name for field in meta.model._meta.concrete_fields}
+    names = dict.fromkeys(name for name in fields if name in columns)
+    for name, field in serializer_class._declared_fields.items():
+        if name in fields and field.source not in (None, "*"):
+            root = field.source.split(".")[0]
+            if root in columns:
+                names[root] = None
+    return list(names)
+
+
+def only_serialized_columns(queryset, serializer_class):
+    """
+    Limita el SELECT de queryset a las columnas que lee serializer_class.
+
+    Si el serializer usa "__all__" se devuelve el queryset sin only().
+
+    Args:
+        queryset: QuerySet del modelo del serializer
+        serializer_class: Clase de ModelSerializer
+
+    Returns:
+        QuerySet: Queryset limitado a las columnas serializadas
+    """
+    columns = serializer_model_columns(serializer_class)
+    if columns is None:
+        return queryset
+    return queryset.only(*columns)
+
+
+class SerializerByActionMixin:
+    """
+    Resuelve el serializer de la acción con un dict de clase en lugar de ramas if.
+
+    DRF llama get_serializer_class varias veces por request; la búsqueda es
+    una sola consulta al dict. Las acciones sin entrada usan
+    get_default_serializer_class() (serializer_class, salvo que la vista lo redefina).
+    """
+
+    # Acción del ViewSet -> clase de serializer
+    serializer_class_by_action = {}
+
+    def get_serializer_class(self):
+        serializer_class = self.serializer_class_by_action.get(self.action)
+        if serializer_class is None:
+            return self.get_default_serializer_class()
+        return serializer_class
+
+    def get_default_serializer_class(self):
+        return self.serializer_class
@@ -7,7 +7,7 @@ from datetime import date, datetime, time
 from django.utils import timezone
 from django.utils.timezone import now
 from django.db.models.functions import TruncDate
-from django.db.models import Sum, Q, F, Count
+from django.db.models import Sum, Q, F, Count, Prefetch
 from PIL import Image, UnidentifiedImageError
 from io import BytesIO
 from decimal import Decimal
@@ -16,6 +16,8 @@ from ..models import (
     AuditLog, InventorySnapshot, ProductVariant, Supplier,
     FinancialTransaction, CashSession, FinancialCategory
 )
+from .constants import INSUFFICIENT_STOCK_CODE
+from .http_cache import bump_model_versions
 
 
 
@@ -23,14 +25,25 @@ class SaleService:
     """Servicios para gestión de ventas"""
     
     @staticmethod
-    def _validate_sale_for_confirmation(sale: Sale) -> None:
-        """Valida que una venta puede ser confirmada"""
+    def _validate_sale_for_confirmation(sale: Sale) -> list:
+        """
+        Valida que una venta puede ser confirmada.
+
+        Returns:
+            list: Detalles de la venta con variante, producto y stock ya cargados,
+            para reutilizarlos al crear los movimientos
+        """
         if sale.status != "pending":
             raise ValidationError("La venta no está pendiente")
         
-        # Traer los detalles de la venta
-        details = sale.details.select_related("variant").all()
-        if not details.exists():
+        # Traer los detalles una sola vez: variante y producto en un SELECT y el
+        # stock anotado, en lugar de un SUM de movimientos por variante
+        details = list(
+            sale.details.prefetch_related(
+                Prefetch("variant", queryset=ProductVariant.objects.select_related("product").with_current_stock())
+            )
+        )
+        if not details:
             raise ValidationError("La venta no tiene Productos")
         
         for detail in details:
@@ -43,7 +56,8 @@ class SaleService:
             if detail.variant.stock < detail.quantity:
                 raise ValidationError(
                     f"Stock insuficiente para {detail.variant.product.name}. "
-                    f"Disponible: {detail.variant.stock}, Requerido: {detail.quantity}"
+                    f"Disponible: {detail.variant.stock}, Requerido: {detail.quantity}",
+                    code=INSUFFICIENT_STOCK_CODE,
                 )
         
         # Validar mes cerrado
@@ -55,9 +69,11 @@ class SaleService:
         
         if last_closed and sale.created_at.date() <= last_closed.month:
             raise ValidationError("No se pueden registrar movimientos en un mes cerrado")
+
+        return details
     
     @staticmethod
-    def _create_sale_movements(sale: Sale, user) -> list:
+    def _create_sale_movements(sale: Sale, user, details: list) -> list:
         """Crea los movimientos de inventario vinculados a la venta"""
     
         # 1. Verificar duplicados usando la FK (mucho más eficiente que buscar en texto)
@@ -67,7 +83,6 @@ class SaleService:
         ).exists():
             raise ValidationError("Esta venta ya tiene movimientos de salida registrados")
         
-        details = sale.details.select_related("variant").all()
         movements = []
         
         for detail in details:
@@ -82,19 +97,21 @@ class SaleService:
                 )
             )
         
-        return MovementInventory.objects.bulk_create(movements)
+        created = MovementInventory.objects.bulk_create(movements)
+        # bulk_create no emite post_save
+        bump_model_versions(MovementInventory)
+        return created
     
     @staticmethod
-    def _log_sale_confirmation(sale: Sale, user) -> None:
+    def _log_sale_confirmation(sale: Sale, user, details: list) -> None:
         """Registra en auditoría la confirmación de venta"""
-        details = sale.details.select_related("variant").all()
         AuditLog.objects.create(
             action="confirm_sale",
             entity="sale",
             entity_id=sale.id,
             performed_by=user.username,
             extra_data={
-                "total_items": details.count(),
+                "total_items": len(details),
                 "total_amount": float(sale.total),
             },
         )
@@ -141,8 +158,9 @@ class SaleService:
         """Registra el ingreso de dinero en la contabilidad"""
         
         # 1. Evitar duplicados (Una transacción por venta)
-        if FinancialTransaction.objects.filter(sale=sale).exists():
-            return FinancialTransaction.objects.filter(sale=sale).first()
+        existing = FinancialTransaction.objects.filter(sale=sale).first()
+        if existing is not None:
+            return existing
 
         # 2. Buscar categoría de ventas
         category = cls._get_or_create_sales_category()
@@ -171,8 +189,11 @@ class SaleService:
             # Traer la venta con bloqueo para evitar concurrentes
             sale = Sale.objects.select_for_update().get(id=sale_id)
             
+            # El pre_save de Sale no necesita volver a leer el estado: la fila está bloqueada
+            sale._old_status = sale.status
+
             # Validaciones
-            cls._validate_sale_for_confirmation(sale)
+            details = cls._validate_sale_for_confirmation(sale)
             
             # Asignar numeración si no tiene
             if not sale.document_number:
@@ -191,16 +212,21 @@ class SaleService:
                     sale.paid_at = now()
             
             sale.created_by = user.username
-            sale.save()
+            sale.save(
+                update_fields=[
+                    "document_number", "invoice_required", "status",
+                    "payment_status", "paid_at", "created_by", "updated_at",
+                ]
+            )
             
             # Crear movimientos de inventario
-            cls._create_sale_movements(sale, user)
+            cls._create_sale_movements(sale, user, details)
             
             # --- NUEVO: Registrar entrada de dinero ---
             cls._register_financial_entry(sale, user)
             
             # Registrar auditoría
-            cls._log_sale_confirmation(sale, user)
+            cls._log_sale_confirmation(sale, user, details)
 
             return sale
 
@@ -473,7 +499,10 @@ class MovementService:
         
         current_stock = variant.stock
         if current_stock < quantity:
-            raise ValidationError(f"Stock insuficiente. Actual: {current_stock}, Requerido: {quantity}")
+            raise ValidationError(
+                f"Stock insuficiente. Actual: {current_stock}, Requerido: {quantity}",
+                code=INSUFFICIENT_STOCK_CODE,
+            )
         
         with transaction.atomic():
             movement = MovementInventory.objects.create(
@@ -726,6 +755,8 @@ class ImageService:
             
             # Establecer la nueva imagen como primary
             ProductImage.objects.filter(id=image_id, product=product).update(is_primary=True)
+        # update() no emite post_save
+        bump_model_versions(ProductImage)
 
     @classmethod
     def optimize_image(cls, image_file):
@@ -1,7 +1,8 @@
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
 from django.db.models import Sum
-from ..models import SaleDetail, Sale, MovementInventory
+from ..models import SaleDetail, Sale, MovementInventory, Product, ProductVariant, ProductImage
+from .http_cache import bump_model_versions
 from ..notifications.services import NotificationService
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
@@ -26,6 +27,9 @@ def update_sale_total_on_delete(sender, instance, **kwargs):
 @receiver(pre_save, sender=Sale)
 def capture_old_status(sender, instance, **kwargs):
     """Captura el estado anterior de la venta para detectar cambios"""
+    if "_old_status" in instance.__dict__:
+        # Quien guarda ya lo conoce (p. ej. confirm_sale, con la fila bloqueada)
+        return
     if instance.pk:
         try:
             old_instance = Sale.objects.get(pk=instance.pk)
@@ -40,7 +44,8 @@ def notify_manager_on_new_sale(sender, instance, created, **kwargs):
     """
     Envía una notificación al administrador cuando se confirma una venta
     """
-    old_status = getattr(instance, '_old_status', None)
+    # Se consume para que el próximo save vuelva a capturarlo
+    old_status = instance.__dict__.pop('_old_status', None)
     
     # Consideramos "confirmada" si el status pasa a paid, processing o completed
     is_confirmed_now = instance.status in ['paid', 'processing', 'completed']
@@ -78,4 +83,21 @@ def stock_movement_saved(sender, instance, **kwargs):
 
 @receiver(post_delete, sender=MovementInventory)
 def stock_movement_deleted(sender, instance, **kwargs):
-    broadcast_stock_update(instance.variant)
\ No newline at end of file
+    broadcast_stock_update(instance.variant)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=MovementInventory)
+@receiver(post_delete, sender=MovementInventory)
+@receiver(post_save, sender=Sale)
+@receiver(post_delete, sender=Sale)
+@receiver(post_save, sender=SaleDetail)
+@receiver(post_delete, sender=SaleDetail)
+def invalidate_catalog_etags(sender, **kwargs):
+    """Invalida los ETag de los listados que dependen del modelo modificado"""
+    bump_model_versions(sender)
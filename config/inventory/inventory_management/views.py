@@ -9,6 +9,8 @@ from rest_framework.exceptions import ValidationError
 from ..models import MovementInventory, InventorySnapshot
 from ..core.services import daily_inventory_summary, create_adjustment, close_inventory_month
 from ..core.api_responses import error_response, success_response
+from ..core.pagination import SmallPage
+from ..core.serializers import only_serialized_columns
 from .serializers import (
     MovementInventorySerializer,
     InventoryHistorySerializer,
@@ -29,11 +31,38 @@ class MovementInventoryViewSet(viewsets.ReadOnlyModelViewSet):
       * Devoluciones: create_sale_return()
       * Ajustes: AdjustmentViewSet (controlado)
     """
-    queryset = MovementInventory.objects.all().select_related(
-        'variant', 'variant__product'
-    )
+    # MovementInventorySerializer solo expone el id de la variante: no hace falta el JOIN
+    queryset = MovementInventory.objects.all()
     serializer_class = MovementInventorySerializer
     permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
+    pagination_class = SmallPage
+    # Orden total para que cada página sea un LIMIT/OFFSET estable
+    ordering = ['-created_at', '-id']
+
+    def get_queryset(self):
+        """
+        Obtener el queryset de movimientos con solo las columnas que serializa.
+
+        Returns:
+            QuerySet: Movimientos de inventario
+        """
+        return only_serialized_columns(super().get_queryset(), self.get_serializer_class())
+
+    def list(self, request, *args, **kwargs):
+        """
+        Listar movimientos como dicts de values(), sin instanciar modelos ni serializer.
+
+        MovementInventorySerializer solo expone columnas planas (la FK como id),
+        así que values() produce exactamente la misma salida.
+
+        Returns:
+            Response: Página de movimientos
+        """
+        rows = self.filter_queryset(self.get_queryset()).values(*self.get_serializer_class().Meta.fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(list(rows))
 
 
 @extend_schema(tags=['InventoryHistory'])
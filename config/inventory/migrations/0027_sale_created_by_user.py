@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-17 10:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_created_by_user(apps, schema_editor):
+    """Enlaza las ventas existentes con el usuario cuyo username coincide con created_by."""
+    Sale = apps.get_model("inventory", "Sale")
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split("."))
+    # UPDATE ... SET created_by_user_id = (SELECT id FROM auth_user WHERE username = created_by)
+    Sale.objects.filter(created_by_user__isnull=True).update(
+        created_by_user=models.Subquery(
+            User.objects.filter(username=models.OuterRef("created_by")).values("pk")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0026_systemnotification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='created_by_user',
+            field=models.ForeignKey(blank=True, db_index=False, help_text='Usuario que creó la venta (created_by se conserva como texto de auditoría)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='created_sales', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_created_by_user, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['created_by_user', 'is_order', '-created_at'], name='sale_owner_order_idx'),
+        ),
+    ]
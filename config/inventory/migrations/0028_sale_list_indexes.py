@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-17 10:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0027_sale_created_by_user'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['status', '-created_at'], name='sale_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['-created_at'], name='sale_created_idx'),
+        ),
+    ]
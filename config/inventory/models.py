@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import connections, models
 from django.db.models import Sum
+from django.db.models.functions import Cast, Coalesce, JSONObject
 from storages.backends.s3boto3 import S3Boto3Storage
 from django.conf import settings
 
@@ -179,6 +180,24 @@ class ProductImage(models.Model):
         return f"Image for {self.product.name}"
 
 
+def images_by_pk_prefetch(lookup="images"):
+    """Prefetch de imágenes ordenadas por pk, el mismo orden que usa .first() sin prefetch."""
+    return models.Prefetch(lookup, queryset=ProductImage.objects.order_by("pk"))
+
+
+class ProductVariantQuerySet(models.QuerySet):
+    def with_current_stock(self):
+        """
+        Anota current_stock con la suma de los movimientos de cada variante.
+
+        ProductVariant.stock lo usa en lugar de agregar los movimientos por variante.
+
+        Returns:
+            QuerySet: Variantes
+        """
+        return self.annotate(current_stock=Coalesce(Sum("movements__quantity"), 0))
+
+
 class ProductVariant(models.Model):
     """Variante de producto
 
@@ -216,6 +235,8 @@ class ProductVariant(models.Model):
     updated_by = models.CharField(max_length=50)  # mientras se usa user
     is_deleted = models.BooleanField(default=False)
 
+    objects = ProductVariantQuerySet.as_manager()
+
     def __str__(self):
         return f"Variant of {self.product.name} - {self.color} - {self.size}"
 
@@ -227,21 +248,73 @@ class ProductVariant(models.Model):
         """
         Calcula el stock actual de la variante sumando todos los movimientos de inventario.
         
+        Si el queryset ya anotó `current_stock` (Sum de movimientos) se usa ese valor.
+
         Returns:
             int: Stock actual (positivo para entradas, negativo para salidas)
         """
+        current_stock = getattr(self, "current_stock", None)
+        if current_stock is not None:
+            return current_stock
         return self.movements.aggregate(
             total=Sum("quantity")
         )["total"] or 0
 
 
+class SaleQuerySet(models.QuerySet):
+    def with_details_json(self):
+        """
+        Cargar los detalles de cada venta junto con la venta.
+
+        En PostgreSQL cada fila trae `details_json`: los detalles ya armados como
+        arreglo JSON (jsonb_agg en una subconsulta correlacionada), con variante,
+        producto y precios en texto. En otros motores se prefetchean los detalles
+        con su variante y producto.
+
+        Returns:
+            QuerySet: Ventas
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.prefetch_related(
+                models.Prefetch("details", queryset=SaleDetail.objects.select_related("variant__product").order_by("id"))
+            )
+
+        # Import diferido: contrib.postgres requiere el driver de PostgreSQL
+        from django.contrib.postgres.aggregates import JSONBAgg
+
+        details = (
+            SaleDetail.objects.filter(sale=models.OuterRef("pk"))
+            .order_by()
+            .values("sale")
+            .annotate(
+                data=JSONBAgg(
+                    JSONObject(
+                        variant_id="variant_id",
+                        product_name="variant__product__name",
+                        gender="variant__gender",
+                        color="variant__color",
+                        size="variant__size",
+                        quantity="quantity",
+                        # En texto para conservar los decimales como str(Decimal)
+                        price=Cast("price", models.TextField()),
+                        subtotal=Cast("subtotal", models.TextField()),
+                    ),
+                    order_by="id",
+                )
+            )
+            .values("data")
+        )
+        return self.annotate(details_json=models.Subquery(details, output_field=models.JSONField()))
+
+
 class Sale(models.Model):
     """Venta
 
     Attributes:
         customer (CharField): Cliente de la venta
         created_at (DateTimeField): Fecha de creación
-        created_by (CharField): Usuario que creó la venta
+        created_by (CharField): Usuario que creó la venta (texto, solo auditoría)
+        created_by_user (ForeignKey): Usuario que creó la venta
         status (CharField): Estado de la venta
         is_order (BooleanField): Si es una orden
         total (DecimalField): Total de la venta
@@ -251,6 +324,16 @@ class Sale(models.Model):
     customer = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
     created_by = models.CharField(max_length=50)
+    created_by_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="created_sales",
+        # El índice compuesto sale_owner_order_idx ya empieza por esta columna
+        db_index=False,
+        help_text="Usuario que creó la venta (created_by se conserva como texto de auditoría)",
+    )
     status = models.CharField(
         max_length=20,
         choices=[
@@ -321,11 +404,21 @@ class Sale(models.Model):
         help_text="True si este documento fue emitido como Factura Electrónica ante la DIAN"
     )
 
+    objects = SaleQuerySet.as_manager()
+
     class Meta:
         permissions = [
             # Permisos personalizados únicos (los demás son creados automáticamente por Django)
             ("confirm_sale", "Can confirm sales"),
         ]
+        indexes = [
+            # "Mis pedidos" de la tienda: filtra por creador y is_order, ordena por -created_at
+            models.Index(fields=["created_by_user", "is_order", "-created_at"], name="sale_owner_order_idx"),
+            # Listado de ventas (más recientes primero), con o sin filtro por estado;
+            # también cubre el JOIN de SaleDetail que filtra ventas pendientes
+            models.Index(fields=["status", "-created_at"], name="sale_status_created_idx"),
+            models.Index(fields=["-created_at"], name="sale_created_idx"),
+        ]
 
     def __str__(self):
         return f"Sale to {self.customer} - {self.status}"
@@ -3,9 +3,13 @@ Serializers para gestión de productos
 """
 from rest_framework import serializers
 from ..models import Product, ProductVariant, ProductImage
+from ..core.serializers import CachedFieldsMixin
 
+# Atributo donde ProductViewSet precarga las variantes no eliminadas - Usado en products/views.py
+NON_DELETED_VARIANTS_ATTR = "non_deleted_variants"
 
-class ProductImageSerializer(serializers.ModelSerializer):
+
+class ProductImageSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer para imágenes de productos con validación y procesamiento
     """
@@ -59,7 +63,7 @@ class ProductImageSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(str(e))
 
 
-class ProductVariantSerializer(serializers.ModelSerializer):
+class ProductVariantSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para variantas de productos"""
     stock = serializers.IntegerField(read_only=True)
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -79,9 +83,10 @@ class ProductVariantSerializer(serializers.ModelSerializer):
     def get_image_url(self, obj):
         """Obtener URL de imagen principal del producto padre."""
         try:
-            img = obj.product.images.filter(is_primary=True, variant__isnull=True).first()
-            if not img:
-                img = obj.product.images.first()
+            # Se filtra en Python para aprovechar product.images si viene precargado
+            images = list(obj.product.images.all())
+            product_primary = [image for image in images if image.is_primary and image.variant_id is None]
+            img = min(product_primary or images, key=lambda image: image.pk, default=None)
             if img and img.image:
                 return img.image.url
         except Exception:
@@ -89,7 +94,7 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return None
 
 
-class ProductReadSerializer(serializers.ModelSerializer):
+class ProductReadSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para leer productos con relaciones"""
     images = ProductImageSerializer(many=True, read_only=True)
     variants = serializers.SerializerMethodField()
@@ -105,7 +110,10 @@ class ProductReadSerializer(serializers.ModelSerializer):
         Returns:
             list: Lista de variantes serializadas
         """
-        return ProductVariantSerializer(obj.variants.filter(is_deleted=False), many=True).data
+        variants = getattr(obj, NON_DELETED_VARIANTS_ATTR, None)
+        if variants is None:
+            variants = obj.variants.filter(is_deleted=False)
+        return ProductVariantSerializer(variants, many=True).data
 
     def get_image_url(self, obj):
         """
@@ -146,7 +154,7 @@ class ProductReadSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer principal para productos"""
     class Meta:
         model = Product
@@ -6,10 +6,15 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError as DRFValidationError
-from django.db.models import F, Exists, OuterRef, ProtectedError
-from ..models import Product, ProductVariant, ProductImage
+from django.db.models import F, Exists, OuterRef, Prefetch, ProtectedError
+from ..models import MovementInventory, Product, ProductVariant, ProductImage, images_by_pk_prefetch
+from ..core.http_cache import ConditionalGetMixin
+from ..core.pagination import BigPage, SmallPage
+from ..core.prefetch import AutoPrefetchViewSetMixin
+from ..core.serializers import SerializerByActionMixin, only_serialized_columns
 from ..core.services import ImageService
 from .serializers import (
+    NON_DELETED_VARIANTS_ATTR,
     ProductSerializer,
     ProductReadSerializer,
     ProductVariantSerializer,
@@ -17,7 +22,7 @@ from .serializers import (
 )
 
 @extend_schema(tags=['Products'])
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SerializerByActionMixin, AutoPrefetchViewSetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de productos
     
@@ -27,23 +32,37 @@ class ProductViewSet(viewsets.ModelViewSet):
     - Eliminación: Usuarios con permiso delete_product
     """
     queryset = Product.objects.all()
+    # Lectura incluye variantes, imágenes y stock (movimientos)
+    etag_models = (Product, ProductVariant, ProductImage, MovementInventory)
     serializer_class = ProductSerializer
+    serializer_class_by_action = {'list': ProductReadSerializer, 'retrieve': ProductReadSerializer}
     permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
     filterset_fields = ['brand', 'active', 'product_type']
     search_fields = ['name', 'brand', 'description']
     ordering_fields = ['name', 'created_at', 'updated_at']
     ordering = ['name']
     
-    def get_serializer_class(self):
+    def get_queryset(self):
         """
-        Obtener el serializer class según la acción.
-        
+        Obtener el queryset de productos.
+
+        En lectura precarga imágenes y variantes no eliminadas (con su stock
+        anotado) para que ProductReadSerializer no consulte por producto.
+
         Returns:
-            Serializer: ProductReadSerializer para list/retrieve, ProductSerializer para otros
+            QuerySet: Productos
         """
+        queryset = super().get_queryset()
         if self.action in ['list', 'retrieve']:
-            return ProductReadSerializer
-        return ProductSerializer
+            return queryset.prefetch_related(
+                images_by_pk_prefetch(),
+                Prefetch(
+                    "variants",
+                    queryset=ProductVariant.objects.filter(is_deleted=False).with_current_stock(),
+                    to_attr=NON_DELETED_VARIANTS_ATTR,
+                ),
+            )
+        return queryset
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -59,19 +78,21 @@ class ProductViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=['ProductsVariants'])
-class ProductVariantViewSet(viewsets.ModelViewSet):
+class ProductVariantViewSet(AutoPrefetchViewSetMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de variantas de productos
     
     - Requiere permisos de inventario
     """
-    queryset = ProductVariant.objects.all().select_related('product')
+    queryset = ProductVariant.objects.all()
     serializer_class = ProductVariantSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
     filterset_fields = ['product', 'gender', 'color', 'active']
     search_fields = ['product__name', 'product__brand', 'color', 'size']
     ordering_fields = ['price', 'cost', 'created_at', 'product__name']
     ordering = ['product__name', 'color', 'size']
+    # Los selectores de variantes cargan el catálogo completo: menos páginas por consulta
+    pagination_class = BigPage
     
     def get_queryset(self):
         """
@@ -80,7 +101,12 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
         Returns:
             QuerySet: Variantes de producto no eliminadas
         """
-        return super().get_queryset().filter(is_deleted=False)
+        queryset = super().get_queryset().filter(is_deleted=False)
+        if self.action in ['list', 'retrieve']:
+            # image_url recorre product.images y stock suma movimientos por variante
+            queryset = queryset.with_current_stock().prefetch_related(images_by_pk_prefetch("product__images"))
+            queryset = only_serialized_columns(queryset, self.get_serializer_class())
+        return queryset
     
     def destroy(self, request, *args, **kwargs):
         """
@@ -98,13 +124,16 @@ class ProductVariantViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 @extend_schema(tags=['ProductsImages'])
-class ProductImageViewSet(viewsets.ModelViewSet):
+class ProductImageViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de imágenes de productos
     
     - Requiere permisos de inventario
     """
     queryset = ProductImage.objects.all().select_related('product')
+    # Cada fila resuelve la URL de su archivo en el storage
+    pagination_class = SmallPage
+    etag_models = (ProductImage,)
     serializer_class = ProductImageSerializer
     permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
 
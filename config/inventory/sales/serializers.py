@@ -5,6 +5,7 @@ from rest_framework import serializers
 from django.db import models
 from django.utils import timezone
 from ..models import Sale, SaleDetail, MovementInventory, ProductVariant, ElectronicInvoice
+from ..core.serializers import CachedFieldsMixin
 
 
 class EmptySerializer(serializers.Serializer):
@@ -67,7 +68,7 @@ class SaleDetailCreateSerializer(serializers.ModelSerializer):
         return detail
 
 
-class SaleCreateSerializer(serializers.ModelSerializer):
+class SaleCreateSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para crear ventas"""
     payment_method = serializers.ChoiceField(
         choices=["CASH", "NEQUI", "DAVIPLATA", "CARD", "TRANSFER", "PSE", "OTHER"],
@@ -96,6 +97,8 @@ class SaleCreateSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if request and request.user:
             validated_data['created_by'] = request.user.username
+            if request.user.is_authenticated:
+                validated_data['created_by_user'] = request.user
         validated_data["payment_status"] = "paid"
         validated_data["paid_at"] = timezone.now()
         validated_data["payment_method"] = validated_data["payment_method"].strip().upper()
@@ -103,14 +106,14 @@ class SaleCreateSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class SaleSimpleSerializer(serializers.ModelSerializer):
+class SaleSimpleSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Versión ligera de la venta para usar dentro de otros serializers"""
     class Meta:
         model = Sale
         fields = ["id", "customer", "status", "total", "created_at"]
 
 
-class SaleDetailReadSerializer(serializers.ModelSerializer):
+class SaleDetailReadSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para leer detalles de venta"""
     variant = serializers.SerializerMethodField()
     sale = SaleSimpleSerializer(read_only=True)
@@ -132,7 +135,7 @@ class SaleDetailReadSerializer(serializers.ModelSerializer):
         return ProductVariantSerializer(obj.variant).data
 
 
-class ElectronicInvoiceSerializer(serializers.ModelSerializer):
+class ElectronicInvoiceSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para facturas electrónicas registradas en Factus"""
     class Meta:
         model = ElectronicInvoice
@@ -142,7 +145,7 @@ class ElectronicInvoiceSerializer(serializers.ModelSerializer):
         ]
 
 
-class SaleReadSerializer(serializers.ModelSerializer):
+class SaleReadSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para leer datos de ventas"""
     details = SaleDetailReadSerializer(many=True, read_only=True)
     electronic_invoice = ElectronicInvoiceSerializer(read_only=True)
@@ -6,14 +6,16 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
 from drf_spectacular.utils import extend_schema
 from rest_framework.response import Response
-from django.core.exceptions import ValidationError
 from django.db.models import Sum, Count
-from ..models import Sale, SaleDetail, MovementInventory, models
+from ..models import Sale, SaleDetail, MovementInventory, Product, ProductImage, ProductVariant, images_by_pk_prefetch, models
+from ..core.http_cache import ConditionalGetMixin
+from ..core.permissions import CachedDjangoModelPermissions, SharedPermissionInstancesMixin
+from ..core.prefetch import AutoPrefetchViewSetMixin
+from ..core.serializers import SerializerByActionMixin
 from ..core.services import SaleService
 from ..core.api_responses import (
     error_response,
     success_response,
-    validation_error_payload,
 )
 from .serializers import (
     SaleCreateSerializer,
@@ -27,7 +29,7 @@ from ..core.factus_service import FactusService
 
 
 @extend_schema(tags=["Sales"])
-class SaleViewSet(viewsets.ModelViewSet):
+class SaleViewSet(SerializerByActionMixin, AutoPrefetchViewSetMixin, SharedPermissionInstancesMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de ventas
 
@@ -37,28 +39,47 @@ class SaleViewSet(viewsets.ModelViewSet):
     - Confirmación: Usuarios autenticados con permiso confirm_sale
     """
 
-    queryset = Sale.objects.prefetch_related(
-        models.Prefetch('details', queryset=SaleDetail.objects.filter(variant__is_deleted=False))
-    ).all()
-    permission_classes = [
-        permissions.IsAuthenticated,
-        permissions.DjangoModelPermissions,
-    ]
+    queryset = Sale.objects.all()
+    serializer_class = SaleCreateSerializer
+    # Código y detalle por defecto de los ValidationError de servicio por acción (ver config.exceptions)
+    validation_error_defaults = {
+        "confirm": {
+            "default_detail": "No se pudo confirmar la venta",
+            "default_code": "SALE_CONFIRMATION_FAILED",
+        },
+    }
+    serializer_class_by_action = {"list": SaleReadSerializer, "retrieve": SaleReadSerializer}
+    permission_classes = [permissions.IsAuthenticated, CachedDjangoModelPermissions]
     filterset_fields = ["status", "is_order"]
     search_fields = ["customer"]
     ordering_fields = ["created_at", "updated_at", "total", "customer"]
     ordering = ["-created_at"]
 
-    def get_serializer_class(self):
+    def get_queryset(self):
         """
-        Obtener el serializer class según la acción.
-        
+        Obtener el queryset según la acción.
+
+        Lectura carga de una vez lo que recorre SaleReadSerializer (factura,
+        detalles y, por detalle, variante con producto, stock e imágenes); las
+        demás acciones usan el queryset simple.
+
         Returns:
-            Serializer: SaleReadSerializer para list/retrieve, SaleCreateSerializer para otros
+            QuerySet: Ventas
         """
+        queryset = super().get_queryset()
         if self.action in ["list", "retrieve"]:
-            return SaleReadSerializer
-        return SaleCreateSerializer
+            # La factura la carga AutoPrefetchViewSetMixin; los detalles se filtran a mano y
+            # sus variantes se cargan como en SaleDetailViewSet (sin select_related en los
+            # detalles: la variante ya cacheada haría que Django saltara su Prefetch)
+            return queryset.prefetch_related(
+                models.Prefetch("details", queryset=SaleDetail.objects.filter(variant__is_deleted=False)),
+                models.Prefetch(
+                    "details__variant",
+                    queryset=ProductVariant.objects.select_related("product").with_current_stock(),
+                ),
+                images_by_pk_prefetch("details__variant__product__images"),
+            )
+        return queryset
 
     @action(detail=True, methods=["post"])
     def confirm(self, request, pk=None):
@@ -78,43 +99,13 @@ class SaleViewSet(viewsets.ModelViewSet):
                 http_status=status.HTTP_403_FORBIDDEN,
             )
 
+        # Los ValidationError del servicio los traduce config.exceptions (400, o 409 si falta stock)
         try:
             sale = SaleService.confirm_sale(
                 sale_id=pk, 
                 user=request.user, 
                 invoice_required=(request.data.get('invoicing_method') != 'NONE')
             )
-
-            # --- NUEVO: Hook de Facturación Electrónica ---
-            # Solo si el método es AUTOMATIC (Factus)
-            method = request.data.get('invoicing_method', sale.invoicing_method)
-            is_automatic = method == 'AUTOMATIC'
-            
-            if is_automatic:
-                # Intentar crear la factura en Factus
-                # En producción esto debería ser un background task (Celery/Huey)
-                invoice, error = FactusService.create_invoice(sale)
-                if error:
-                    # Registramos el error pero no revertimos la confirmación de inventario
-                    # ya que el stock ya se movió. El usuario podrá reintentar luego.
-                    return success_response(
-                        detail=f"Venta confirmada, pero hubo un error con la DIAN (Factus): {error}",
-                        code="SALE_CONFIRMED_INVOICE_FAILED",
-                    )
-                
-            return success_response(
-                detail="Venta confirmada y Factura Electrónica generada exitosamente" if is_automatic else "Venta confirmada (Documento POS generado)",
-                code="SALE_CONFIRMED",
-            )
-        except ValidationError as e:
-            payload = validation_error_payload(
-                e,
-                default_detail="No se pudo confirmar la venta",
-                default_code="SALE_CONFIRMATION_FAILED",
-            )
-            is_stock_conflict = any("Stock insuficiente" in msg for msg in payload["errors"])
-            http_status = status.HTTP_409_CONFLICT if is_stock_conflict else status.HTTP_400_BAD_REQUEST
-            return Response(payload, status=http_status)
         except Sale.DoesNotExist:
             return error_response(
                 detail="Venta no encontrada",
@@ -122,6 +113,28 @@ class SaleViewSet(viewsets.ModelViewSet):
                 http_status=status.HTTP_404_NOT_FOUND,
             )
 
+        # --- NUEVO: Hook de Facturación Electrónica ---
+        # Solo si el método es AUTOMATIC (Factus)
+        method = request.data.get('invoicing_method', sale.invoicing_method)
+        is_automatic = method == 'AUTOMATIC'
+        
+        if is_automatic:
+            # Intentar crear la factura en Factus
+            # En producción esto debería ser un background task (Celery/Huey)
+            invoice, error = FactusService.create_invoice(sale)
+            if error:
+                # Registramos el error pero no revertimos la confirmación de inventario
+                # ya que el stock ya se movió. El usuario podrá reintentar luego.
+                return success_response(
+                    detail=f"Venta confirmada, pero hubo un error con la DIAN (Factus): {error}",
+                    code="SALE_CONFIRMED_INVOICE_FAILED",
+                )
+            
+        return success_response(
+            detail="Venta confirmada y Factura Electrónica generada exitosamente" if is_automatic else "Venta confirmada (Documento POS generado)",
+            code="SALE_CONFIRMED",
+        )
+
     @action(detail=True, methods=["post"])
     def cancel(self, request, pk=None):
         """
@@ -175,7 +188,7 @@ class SaleViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=["SalesReturns"])
-class SaleReturnViewSet(viewsets.ModelViewSet):
+class SaleReturnViewSet(SerializerByActionMixin, SharedPermissionInstancesMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de devoluciones de ventas
 
@@ -188,21 +201,11 @@ class SaleReturnViewSet(viewsets.ModelViewSet):
     ).select_related("variant__product", "sale", "sale__customer")
 
     serializer_class = SaleReturnSerializer
-    permission_classes = [
-        permissions.IsAuthenticated,
-        permissions.DjangoModelPermissions,
-    ]
-
-    def get_serializer_class(self):
-        """
-        Obtener el serializer class según la acción.
-        
-        Returns:
-            Serializer: SaleReturnCreateSerializer para create/create_sale_return, SaleReturnSerializer para otros
-        """
-        if self.action in ["create", "create_sale_return"]:
-            return SaleReturnCreateSerializer
-        return SaleReturnSerializer
+    serializer_class_by_action = {
+        "create": SaleReturnCreateSerializer,
+        "create_sale_return": SaleReturnCreateSerializer,
+    }
+    permission_classes = [permissions.IsAuthenticated, CachedDjangoModelPermissions]
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -354,37 +357,47 @@ class SaleReturnViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=["SalesDetails"])
-class SaleDetailViewSet(viewsets.ModelViewSet):
+class SaleDetailViewSet(
+    SerializerByActionMixin,
+    AutoPrefetchViewSetMixin,
+    ConditionalGetMixin,
+    SharedPermissionInstancesMixin,
+    viewsets.ModelViewSet,
+):
     """
     ViewSet para gestión de detalles de ventas
 
     - Solo muestra detalles de ventas pendientes
+    - Lectura con ETag: 304 mientras no cambien detalles, ventas ni la variante que muestran
     """
 
     serializer_class = SaleDetailCreateSerializer
-    permission_classes = [
-        permissions.IsAuthenticated,
-        permissions.DjangoModelPermissions,
-    ]
+    serializer_class_by_action = {"list": SaleDetailReadSerializer, "retrieve": SaleDetailReadSerializer}
+    permission_classes = [permissions.IsAuthenticated, CachedDjangoModelPermissions]
+    # Orden total para que cada página (PAGE_SIZE) sea un LIMIT/OFFSET estable
+    ordering = ["id"]
+    # SaleDetailReadSerializer anida la venta y la variante (producto, stock e imagen)
+    etag_models = (SaleDetail, Sale, ProductVariant, Product, ProductImage, MovementInventory)
 
     def get_queryset(self):
         """Filtra por venta pendiente específica"""
         sale_id = self.kwargs.get("sale_pk")
         if sale_id:
-            return SaleDetail.objects.filter(
-                sale_id=sale_id, sale__status="pending", quantity__gt=0, variant__is_deleted=False
-            ).select_related("sale", "variant", "variant__product")
-        return SaleDetail.objects.filter(
-            sale__status="pending", quantity__gt=0, variant__is_deleted=False
-        ).select_related("sale", "variant", "variant__product")
-
-    def get_serializer_class(self):
-        """
-        Obtener el serializer class según la acción.
-        
-        Returns:
-            Serializer: SaleDetailReadSerializer para list/retrieve, SaleDetailCreateSerializer para otros
-        """
+            # Se valida la venta una sola vez y el SELECT de detalles no necesita filtrar por su estado
+            if not Sale.objects.filter(pk=sale_id, status="pending").exists():
+                return SaleDetail.objects.none()
+            queryset = SaleDetail.objects.filter(sale_id=sale_id)
+        else:
+            queryset = SaleDetail.objects.filter(sale__status="pending")
+        queryset = queryset.filter(quantity__gt=0, variant__is_deleted=False)
         if self.action in ["list", "retrieve"]:
-            return SaleDetailReadSerializer
-        return SaleDetailCreateSerializer
+            # La venta la carga AutoPrefetchViewSetMixin; variant es un SerializerMethodField
+            # y ProductVariantSerializer lee product, stock e imágenes de cada variante
+            return queryset.prefetch_related(
+                models.Prefetch(
+                    "variant",
+                    queryset=ProductVariant.objects.select_related("product").with_current_stock(),
+                ),
+                images_by_pk_prefetch("variant__product__images"),
+            )
+        return queryset.select_related("sale", "variant", "variant__product")
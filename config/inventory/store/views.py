@@ -24,6 +24,8 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from ..core.api_responses import error_response, success_response
+from ..core.constants import INSUFFICIENT_STOCK_CODE
+from ..core.http_cache import bump_model_versions
 from ..models import (
     AuditLog,
     MovementInventory,
@@ -36,6 +38,7 @@ from ..models import (
     ShipmentEvent,
     StoreBranding,
 )
+from ..users.serializers import user_group_names
 from .serializers import (
     StoreBrandingSerializer,
     StoreBrandingUpdateSerializer,
@@ -48,11 +51,21 @@ from .serializers import (
     StoreShippingWebhookSerializer,
 )
 from .shipping import ShippingProviderError, create_shipment_for_sale, is_valid_shipping_webhook_signature
-from .wompi import WompiError, amount_to_cents, build_checkout_url, extract_event_signature_payload, get_transaction
+from .wompi import (
+    WompiError,
+    amount_to_cents,
+    build_checkout_url,
+    extract_event_signature_payload,
+    get_transaction,
+    wompi_config_status,
+)
 
 logger = logging.getLogger(__name__)
 
 
+# Etiquetas de género para armar variant_info desde details_json
+GENDER_LABELS = dict(ProductVariant._meta.get_field("gender").choices)
+
 ORDER_STATUS_META = {
     "pending": {"label": "Pendiente de pago", "stage": 1},
     "paid": {"label": "Pagado", "stage": 2},
@@ -320,8 +333,26 @@ def _resolve_image_url(image_field) -> str | None:
 def _serialize_sale_items(sale: Sale) -> list[dict]:
     """
     Serializa los detalles de una venta.
+
+    Usa `details_json` o los detalles prefetcheados si la venta viene de
+    Sale.objects.with_details_json(); si no, los consulta.
     """
-    details = sale.details.select_related("variant__product").all()
+    if hasattr(sale, "details_json"):
+        return [
+            {
+                "variant_id": item["variant_id"],
+                "product_name": item["product_name"],
+                "variant_info": f"{GENDER_LABELS.get(item['gender'], item['gender'])} - {item['color']} - {item['size']}",
+                "quantity": item["quantity"],
+                "unit_price": item["price"],
+                "subtotal": item["subtotal"],
+            }
+            for item in sale.details_json or []
+        ]
+
+    details = sale.details.all()
+    if "details" not in getattr(sale, "_prefetched_objects_cache", {}):
+        details = details.select_related("variant__product").order_by("id")
     return [
         {
             "variant_id": detail.variant_id,
@@ -469,7 +500,7 @@ def _serialize_store_user(user: User) -> dict:
         "last_name": user.last_name,
         "is_staff": user.is_staff,
         "is_superuser": user.is_superuser,
-        "groups": list(user.groups.values_list("name", flat=True)),
+        "groups": user_group_names(user),
     }
 
 
@@ -528,7 +559,8 @@ def _ensure_store_order_inventory_discounted(sale: Sale, *, source: str) -> None
         if variant.stock < detail.quantity:
             raise ValidationError(
                 f"Stock insuficiente para {variant.product.name}. "
-                f"Disponible: {variant.stock}, Requerido: {detail.quantity}"
+                f"Disponible: {variant.stock}, Requerido: {detail.quantity}",
+                code=INSUFFICIENT_STOCK_CODE,
             )
 
         movements_to_create.append(
@@ -543,6 +575,8 @@ def _ensure_store_order_inventory_discounted(sale: Sale, *, source: str) -> None
         )
 
     MovementInventory.objects.bulk_create(movements_to_create)
+    # bulk_create no emite post_save
+    bump_model_versions(MovementInventory)
     AuditLog.objects.create(
         action="store_order_inventory_discounted",
         entity="sale",
@@ -815,8 +849,8 @@ class StoreMyOrdersView(APIView):
 
     def get(self, request):
         queryset = (
-            Sale.objects.filter(created_by=request.user.username, is_order=True)
-            .prefetch_related("details__variant__product")
+            Sale.objects.filter(created_by_user=request.user, is_order=True)
+            .with_details_json()
             .order_by("-created_at")
         )
         orders = [_serialize_store_order(sale) for sale in queryset]
@@ -1048,6 +1082,7 @@ class StoreCheckoutView(APIView):
         sale = Sale.objects.create(
             customer=customer,
             created_by=created_by,
+            created_by_user=request.user,
             shipping_address=shipping_address,
             is_order=validated.get("is_order", True),
             total=total,
@@ -1070,6 +1105,8 @@ class StoreCheckoutView(APIView):
             for item in items
         ]
         SaleDetail.objects.bulk_create(sale_details)
+        # bulk_create no emite post_save
+        bump_model_versions(SaleDetail)
 
         return success_response(
             detail="Pedido creado correctamente",
@@ -1150,7 +1187,7 @@ class StoreOrderLookupView(APIView):
                 http_status=status.HTTP_400_BAD_REQUEST,
             )
 
-        queryset = Sale.objects.prefetch_related("details__variant__product").filter(is_order=True)
+        queryset = Sale.objects.with_details_json().filter(is_order=True)
         if request.user.is_authenticated:
             queryset = queryset.filter(Q(created_by="store_api") | Q(created_by=request.user.username))
 
@@ -1559,24 +1596,15 @@ class StoreWompiHealthView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        required = {
-            "WOMPI_PUBLIC_KEY": settings.WOMPI_PUBLIC_KEY,
-            "WOMPI_INTEGRITY_SECRET": settings.WOMPI_INTEGRITY_SECRET,
-            "WOMPI_EVENTS_SECRET": settings.WOMPI_EVENTS_SECRET,
-            "WOMPI_REDIRECT_URL": settings.WOMPI_REDIRECT_URL,
-        }
-        missing = [key for key, value in required.items() if not value]
-        configured = len(missing) == 0
-
-        env = "production" if "production" in settings.WOMPI_API_BASE_URL else "sandbox"
+        wompi_status = wompi_config_status()
         return success_response(
             detail="Estado de configuracion de Wompi obtenido correctamente",
             code="STORE_WOMPI_HEALTH_OK",
-            configured=configured,
-            environment=env,
-            api_base_url=settings.WOMPI_API_BASE_URL,
-            checkout_base_url=settings.WOMPI_CHECKOUT_BASE_URL,
-            missing=missing,
+            configured=wompi_status["configured"],
+            environment=wompi_status["environment"],
+            api_base_url=wompi_status["api_base_url"],
+            checkout_base_url=wompi_status["checkout_base_url"],
+            missing=list(wompi_status["missing"]),
         )
 
 
@@ -1599,7 +1627,7 @@ class StoreOpsOrderListView(APIView):
         page = _parse_positive_int(request.query_params.get("page"), default=1, max_value=10_000)
         page_size = _parse_positive_int(request.query_params.get("page_size"), default=20, max_value=100)
         offset = (page - 1) * page_size
-        sales = list(queryset[offset : offset + page_size].prefetch_related("details__variant__product"))
+        sales = list(queryset.with_details_json()[offset : offset + page_size])
 
         return success_response(
             detail="Ordenes de tienda obtenidas correctamente",
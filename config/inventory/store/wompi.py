@@ -4,19 +4,59 @@ Helpers de integracion con Wompi.
 
 from __future__ import annotations
 
+from functools import lru_cache
 import hashlib
 import json
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Mapping
 from urllib import error, request
 from urllib.parse import quote
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+# Settings obligatorios para operar con Wompi - Usado en wompi_config_status y StoreWompiHealthView
+WOMPI_REQUIRED_SETTINGS = (
+    "WOMPI_PUBLIC_KEY",
+    "WOMPI_INTEGRITY_SECRET",
+    "WOMPI_EVENTS_SECRET",
+    "WOMPI_REDIRECT_URL",
+)
 
 
 class WompiError(Exception):
     """Error de integracion con Wompi."""
 
 
+@lru_cache(maxsize=1)
+def wompi_config_status() -> Mapping[str, Any]:
+    """
+    Estado de configuracion de Wompi.
+
+    Solo cambia al reiniciar el proceso, por eso se calcula una vez y se
+    memoriza; `setting_changed` limpia la cache cuando los tests usan
+    override_settings.
+    """
+    missing = tuple(key for key in WOMPI_REQUIRED_SETTINGS if not getattr(settings, key, ""))
+    api_base_url = settings.WOMPI_API_BASE_URL
+    return MappingProxyType(
+        {
+            "configured": not missing,
+            "environment": "production" if "production" in api_base_url else "sandbox",
+            "api_base_url": api_base_url,
+            "checkout_base_url": settings.WOMPI_CHECKOUT_BASE_URL,
+            "missing": missing,
+        }
+    )
+
+
+@receiver(setting_changed)
+def _reset_wompi_config_status(*, setting, **kwargs):
+    if setting.startswith("WOMPI_"):
+        wompi_config_status.cache_clear()
+
+
 def amount_to_cents(amount: str) -> int:
     return int(round(float(amount) * 100))
 
@@ -1,27 +1,49 @@
+from django.conf import settings
 from django.test import TestCase, override_settings
-from django.contrib.auth.models import Group, User
+from django.contrib.auth.models import Group, Permission, User
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.management import call_command
-from django.db import transaction
+from django.db import connection, transaction
 from django.core.files.uploadedfile import SimpleUploadedFile
-from rest_framework.test import APITestCase
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 from decimal import Decimal
 import json
+import logging
 from PIL import Image
 from io import BytesIO
+from types import MappingProxyType
+from unittest import skipUnless
 from unittest.mock import patch
 from .models import Product, ProductVariant, MovementInventory, Sale, SaleDetail, ProductImage, Shipment, ShipmentEvent, Supplier
 from .core.services import confirm_sale, ImageService
 from .store.shipping import shipping_webhook_signature
+from .store.views import _serialize_sale_items
+from .users.serializers import build_permission_catalog, permission_catalog_values
+
+# Precios de los fixtures de tienda, parseados una sola vez por modulo.
+_D_199_90 = Decimal("199.90")
+_D_120 = Decimal("120.00")
+_D_249_90 = Decimal("249.90")
+_D_140 = Decimal("140.00")
+_D_179_90 = Decimal("179.90")
+_D_90 = Decimal("90.00")
+
+# Alias de utilidades usadas en los fixtures de pedidos y el webhook de envios.
+_now = timezone.now
+_dumps = json.dumps
+_sig = shipping_webhook_signature
 
 
 class ConfirmSaleServiceTest(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(
-            username="testuser", email="test@example.com", password="testpass123"
+            username="testuser", email="test@example.com"
         )
 
         # Crear producto
@@ -375,7 +397,7 @@ class ProductImageSerializerTest(TestCase):
     
     def setUp(self):
         self.user = User.objects.create_user(
-            username="testuser", email="test@example.com", password="testpass123"
+            username="testuser", email="test@example.com"
         )
         self.product = Product.objects.create(
             name="Producto Test", brand="Test", created_by="testuser"
@@ -524,49 +546,50 @@ class ProductImageSerializerTest(TestCase):
 
 
 class ApiErrorContractTest(APITestCase):
-    def setUp(self):
-        self.user = User.objects.create_superuser(
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
             username="apiadmin",
             email="apiadmin@example.com",
-            password="adminpass123",
         )
-        self.client.force_authenticate(user=self.user)
-
-        self.product = Product.objects.create(
+        cls.product = Product.objects.create(
             name="Air Contract Test",
             brand="Nike",
             description="Producto para test de contrato",
-            created_by=self.user.username,
+            created_by=cls.user.username,
         )
-        self.variant = ProductVariant.objects.create(
-            product=self.product,
+        cls.variant = ProductVariant.objects.create(
+            product=cls.product,
             gender="unisex",
             color="Negro",
             size="42",
             price=Decimal("120.00"),
             cost=Decimal("80.00"),
             stock_minimum=2,
-            created_by=self.user.username,
+            created_by=cls.user.username,
         )
-        self.sale = Sale.objects.create(
+        cls.sale = Sale.objects.create(
             customer="Cliente API Test",
-            created_by=self.user.username,
+            created_by=cls.user.username,
             status="pending",
         )
         SaleDetail.objects.create(
-            sale=self.sale,
-            variant=self.variant,
+            sale=cls.sale,
+            variant=cls.variant,
             quantity=3,
             price=Decimal("120.00"),
             subtotal=Decimal("360.00"),
         )
         MovementInventory.objects.create(
-            variant=self.variant,
+            variant=cls.variant,
             movement_type=MovementInventory.MovementType.PURCHASE,
             quantity=1,
-            created_by=self.user.username,
+            created_by=cls.user.username,
         )
 
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
     def test_confirm_sale_insufficient_stock_returns_standard_error_contract(self):
         url = reverse("sales-confirm", args=[self.sale.id])
         response = self.client.post(url, {}, format="json")
@@ -579,6 +602,27 @@ class ApiErrorContractTest(APITestCase):
         self.assertIsInstance(response.data["errors"], list)
         self.assertTrue(any("Stock insuficiente" in message for message in response.data["errors"]))
 
+    @patch("config.exceptions.set_rollback")
+    def test_stock_conflict_status_follows_error_code_not_message(self, _mock_set_rollback):
+        from config.exceptions import custom_exception_handler
+        from .core.constants import INSUFFICIENT_STOCK_CODE
+
+        context = {"view": None}
+        worded_like_stock = custom_exception_handler(ValidationError("Stock insuficiente en bodega"), context)
+        coded_conflict = custom_exception_handler(ValidationError("Sin existencias", code=INSUFFICIENT_STOCK_CODE), context)
+
+        self.assertEqual(worded_like_stock.status_code, 400)
+        self.assertEqual(coded_conflict.status_code, 409)
+
+    def test_confirm_sale_not_pending_returns_bad_request_error_contract(self):
+        Sale.objects.filter(pk=self.sale.pk).update(status="completed")
+        url = reverse("sales-confirm", args=[self.sale.id])
+        response = self.client.post(url, {}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["code"], "SALE_CONFIRMATION_FAILED")
+        self.assertTrue(any("no está pendiente" in message for message in response.data["errors"]))
+
     def test_purchase_supplier_purchases_missing_supplier_id_returns_standard_error_contract(self):
         url = reverse("purchases-supplier-purchases")
         response = self.client.get(url)
@@ -759,150 +803,616 @@ class ApiErrorContractTest(APITestCase):
         self.assertIsNotNone(response.data["images"][0]["url"])
 
 
-@override_settings(STORE_MARGIN_GUARD_ENABLED=False)
-class StorePublicApiTest(APITestCase):
-    def setUp(self):
-        self.ops_user = User.objects.create_superuser(
-            username="storeops",
-            email="storeops@example.com",
-            password="storeops123",
-        )
-        customers_group, _ = Group.objects.get_or_create(name="Customers")
-        self.customer_user = User.objects.create_user(
-            username="cliente_store_tests",
-            email="cliente_store_tests@example.com",
-            password="secret1234",
-            first_name="Cliente",
-            last_name="Tests",
-            is_staff=False,
-        )
-        self.customer_user.groups.add(customers_group)
-        self.product = Product.objects.create(
-            name="Tenis Publicos",
-            brand="Golos",
-            description="Modelo para tienda online",
-            created_by="system",
-            updated_by="system",
+class SaleApiTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username="sales_admin", email="sales_admin@example.com")
+        cls.product = Product.objects.create(name="Tenis Ventas", brand="Golos", created_by="system")
+        cls.variants = ProductVariant.objects.bulk_create(
+            [
+                ProductVariant(
+                    product=cls.product,
+                    gender="unisex",
+                    color="Negro",
+                    size=size,
+                    price=_D_120,
+                    cost=_D_90,
+                    created_by="system",
+                )
+                for size in ("40", "41", "42")
+            ]
         )
-        self.variant = ProductVariant.objects.create(
-            product=self.product,
-            gender="unisex",
-            color="Negro",
-            size="40",
-            price=Decimal("199.90"),
-            cost=Decimal("120.00"),
-            stock_minimum=2,
-            created_by="system",
-            updated_by="system",
-            active=True,
+        cls.sales = Sale.objects.bulk_create(
+            [Sale(customer=f"Cliente Venta {index}", created_by="sales_admin") for index in range(3)]
         )
-        MovementInventory.objects.create(
-            variant=self.variant,
-            movement_type=MovementInventory.MovementType.PURCHASE,
-            quantity=8,
-            created_by="system",
+        SaleDetail.objects.bulk_create(
+            [
+                SaleDetail(sale=sale, variant=variant, quantity=1, price=_D_120, subtotal=_D_120)
+                for sale in cls.sales
+                for variant in cls.variants
+            ]
         )
-        ProductImage.objects.create(
-            product=self.product,
-            variant=self.variant,
-            image="products/store-variant.jpg",
-            is_primary=True,
-            alt_text="Imagen variante principal",
-            created_by="system",
-            updated_by="system",
-        )
-        self.product_b = Product.objects.create(
-            name="Botas Urbanas",
-            brand="Golos",
-            description="Segundo producto para filtros",
-            product_type="boots",
-            created_by="system",
-            updated_by="system",
-        )
-        self.variant_b = ProductVariant.objects.create(
-            product=self.product_b,
-            gender="female",
-            color="Cafe",
-            size="38",
-            price=Decimal("249.90"),
-            cost=Decimal("140.00"),
-            stock_minimum=1,
-            created_by="system",
-            updated_by="system",
-            active=True,
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    @staticmethod
+    def _queries_from(queries, table):
+        return [query["sql"] for query in queries.captured_queries if f'FROM "{table}"' in query["sql"]]
+
+    def test_sales_list_query_count_does_not_grow_with_details(self):
+        # count + ventas (con factura) + detalles + variantes (producto y stock) + imágenes
+        with self.assertNumQueries(5) as queries:
+            response = self.client.get(reverse("sales-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 3)
+        self.assertTrue(all(len(sale["details"]) == 3 for sale in response.data["results"]))
+        self.assertEqual(response.data["results"][0]["details"][0]["variant"]["stock"], 0)
+        # El stock se suma con un JOIN en la consulta de variantes, no por detalle
+        stock_queries = [query["sql"] for query in queries.captured_queries if '"inventory_movementinventory"' in query["sql"]]
+        self.assertEqual(len(stock_queries), 1)
+        self.assertEqual(len(self._queries_from(queries, "inventory_productimage")), 1)
+
+    def test_sale_details_list_query_count_does_not_grow_with_details(self):
+        # count + detalles (con venta) + variantes (producto y stock) + imágenes
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("sale-details-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 9)
+        self.assertEqual(response.data["results"][0]["variant"]["stock"], 0)
+
+    def test_sale_details_list_answers_not_modified_until_a_detail_changes(self):
+        cache.clear()
+        response = self.client.get(reverse("sale-details-list"))
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("sale-details-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        detail = SaleDetail.objects.filter(sale=self.sales[0]).first()
+        detail.quantity = 2
+        with self.captureOnCommitCallbacks(execute=True):
+            detail.save()
+        response = self.client.get(reverse("sale-details-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_sale_details_etag_changes_only_after_the_write_commits(self):
+        cache.clear()
+        etag = self.client.get(reverse("sale-details-list"))["ETag"]
+        detail = SaleDetail.objects.filter(sale=self.sales[0]).first()
+        detail.quantity = 2
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                detail.save()
+                # Un GET durante la escritura conserva el ETag de las filas confirmadas,
+                # así no queda cacheada la versión nueva con datos viejos
+                response = self.client.get(reverse("sale-details-list"), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+        self.assertTrue(callbacks)
+        response = self.client.get(reverse("sale-details-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_sales_permission_instances_are_shared_and_still_enforced(self):
+        from .sales.views import SaleViewSet
+
+        first, second = SaleViewSet().get_permissions(), SaleViewSet().get_permissions()
+        self.assertIs(first[0], second[0])
+
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(reverse("sales-list")).status_code, 401)
+
+        clerk = User.objects.create_user(username="sales_clerk", password=None)
+        self.client.force_authenticate(user=clerk)
+        self.assertEqual(self.client.get(reverse("sales-list")).status_code, 200)
+        self.assertEqual(self.client.post(reverse("sales-list"), {"customer": "Sin permiso"}, format="json").status_code, 403)
+
+    def test_relation_lookups_follow_serializer_sources(self):
+        from .core.prefetch import serializer_relation_lookups
+        from .sales.serializers import SaleDetailCreateSerializer, SaleReadSerializer
+
+        self.assertEqual(
+            serializer_relation_lookups(SaleReadSerializer),
+            (("electronic_invoice",), ("details", "details__sale")),
         )
-        MovementInventory.objects.create(
-            variant=self.variant_b,
-            movement_type=MovementInventory.MovementType.PURCHASE,
-            quantity=4,
-            created_by="system",
-        )
-        self.product_c = Product.objects.create(
-            name="Sandalia Riviera",
-            brand="Costa",
-            description="Tercer producto para relacionados",
-            product_type="sandals",
-            created_by="system",
-            updated_by="system",
-        )
-        self.variant_c = ProductVariant.objects.create(
-            product=self.product_c,
-            gender="female",
-            color="Beige",
-            size="37",
-            price=Decimal("179.90"),
-            cost=Decimal("90.00"),
-            stock_minimum=1,
-            created_by="system",
-            updated_by="system",
-            active=True,
+        # Las FK serializadas como id no necesitan JOIN
+        self.assertEqual(serializer_relation_lookups(SaleDetailCreateSerializer), ((), ()))
+
+    def _stock_for_sale(self, sale):
+        MovementInventory.objects.bulk_create(
+            [
+                MovementInventory(variant=variant, movement_type=MovementInventory.MovementType.PURCHASE, quantity=5, created_by="system")
+                for variant in self.variants
+            ]
         )
-        MovementInventory.objects.create(
-            variant=self.variant_c,
-            movement_type=MovementInventory.MovementType.PURCHASE,
-            quantity=3,
-            created_by="system",
+        return reverse("sales-confirm", args=[sale.id])
+
+    def test_confirm_reads_the_sale_once_and_stock_in_one_query(self):
+        sale = self.sales[2]
+        url = self._stock_for_sale(sale)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        sale_reads = [
+            query["sql"] for query in queries.captured_queries
+            if query["sql"].startswith('SELECT') and 'FROM "inventory_sale" WHERE "inventory_sale"."id" =' in query["sql"]
+        ]
+        self.assertEqual(len(sale_reads), 1)
+        stock_sums = [query["sql"] for query in queries.captured_queries if 'SUM("inventory_movementinventory"."quantity")' in query["sql"]]
+        self.assertEqual(len(stock_sums), 1)
+        self.assertEqual(MovementInventory.objects.filter(sale=sale).count(), len(self.variants))
+
+    def test_confirm_with_automatic_invoice_reports_factus_error_after_confirming(self):
+        sale = self.sales[1]
+        url = self._stock_for_sale(sale)
+
+        with patch("inventory.sales.views.FactusService.create_invoice", return_value=(None, "Timeout")) as mock_create_invoice:
+            response = self.client.post(url, {"invoicing_method": "AUTOMATIC"}, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["code"], "SALE_CONFIRMED_INVOICE_FAILED")
+        mock_create_invoice.assert_called_once()
+        sale.refresh_from_db()
+        self.assertEqual(sale.status, "completed")
+
+
+class ProductApiTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(username="products_admin", email="products_admin@example.com")
+        cls.products = Product.objects.bulk_create(
+            [Product(name=f"Producto Catalogo {index}", brand="Golos", created_by="system") for index in range(3)]
+        )
+        cls.variants = ProductVariant.objects.bulk_create(
+            [
+                ProductVariant(
+                    product=product,
+                    gender="unisex",
+                    color=color,
+                    size="40",
+                    price=_D_120,
+                    cost=_D_90,
+                    created_by="system",
+                )
+                for product in cls.products
+                for color in ("Negro", "Blanco")
+            ]
         )
+        MovementInventory.objects.bulk_create(
+            [
+                MovementInventory(
+                    variant=variant,
+                    movement_type=MovementInventory.MovementType.PURCHASE,
+                    quantity=index + 1,
+                    created_by="system",
+                )
+                for index, variant in enumerate(cls.variants)
+            ]
+        )
+        ProductImage.objects.bulk_create(
+            [
+                ProductImage(product=product, image=f"products/catalogo-{product.id}.jpg", is_primary=True, created_by="system")
+                for product in cls.products
+            ]
+        )
+
+    def setUp(self):
+        self.client.force_authenticate(user=self.user)
+
+    def test_products_list_query_count_does_not_grow_with_products(self):
+        # count + productos + imágenes + variantes con stock anotado
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("products-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 3)
+        stocks = {
+            variant["id"]: variant["stock"]
+            for product in response.data["results"]
+            for variant in product["variants"]
+        }
+        self.assertEqual(stocks, {variant.id: index + 1 for index, variant in enumerate(self.variants)})
+        self.assertTrue(all(variant["image_url"] for product in response.data["results"] for variant in product["variants"]))
+
+    def test_products_list_answers_not_modified_until_catalog_changes(self):
+        cache.clear()
+        response = self.client.get(reverse("products-list"))
+        etag = response["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("products-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            MovementInventory.objects.create(
+                variant=self.variants[0],
+                movement_type=MovementInventory.MovementType.PURCHASE,
+                quantity=10,
+                created_by="system",
+            )
+        # La versión no cambia hasta que la transacción confirma
+        self.assertEqual(self.client.get(reverse("products-list"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        for callback in callbacks:
+            callback()
+        response = self.client.get(reverse("products-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_products_list_skips_etag_without_shared_cache(self):
+        etag = self.client.get(reverse("products-list"))["ETag"]
+
+        with override_settings(CONDITIONAL_GET_ENABLED=False):
+            response = self.client.get(reverse("products-list"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+
+    def test_only_serialized_columns_keeps_all_columns_for_all_fields_serializers(self):
+        from rest_framework import serializers
+        from .core.serializers import only_serialized_columns
+        from .products.serializers import ProductVariantSerializer
+
+        class AllFieldsVariantSerializer(serializers.ModelSerializer):
+            class Meta:
+                model = ProductVariant
+                fields = "__all__"
+
+        queryset = ProductVariant.objects.all()
+        self.assertIs(only_serialized_columns(queryset, AllFieldsVariantSerializer), queryset)
+        limited = only_serialized_columns(queryset, ProductVariantSerializer)
+        self.assertEqual(limited.query.deferred_loading[1], False)
+
+    def test_cached_serializer_fields_are_copied_per_instance(self):
+        from .products.serializers import ProductVariantSerializer
+
+        first, second = ProductVariantSerializer(), ProductVariantSerializer()
+
+        self.assertEqual(list(first.fields), list(second.fields))
+        self.assertIsNot(first.fields["price"], second.fields["price"])
+        self.assertIs(first.fields["price"].parent, first)
+        self.assertIs(second.fields["price"].parent, second)
+
+    def test_movement_inventory_list_is_paged_newest_first_without_joins(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("movement-inventory-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], 6)
+        self.assertEqual([movement["quantity"] for movement in response.data["results"]], [6, 5, 4, 3, 2, 1])
+        self.assertFalse(any("JOIN" in query["sql"] for query in queries.captured_queries))
+
+    def test_movement_inventory_list_matches_serializer_output(self):
+        from .inventory_management.serializers import MovementInventorySerializer
+
+        response = self.client.get(reverse("movement-inventory-list"))
+
+        expected = MovementInventorySerializer(
+            MovementInventory.objects.order_by("-created_at", "-id"), many=True
+        ).data
+        self.assertEqual([dict(row) for row in response.data["results"]], [dict(row) for row in expected])
+
+    def test_list_endpoints_select_only_serialized_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("movement-inventory-list"))
+        movements_sql = queries.captured_queries[-1]["sql"]
+        self.assertIn('"observation"', movements_sql)
+        self.assertNotIn('"created_by"', movements_sql)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("product-variants-list"))
+        variants_sql = next(query["sql"] for query in queries.captured_queries if "inventory_productvariant" in query["sql"] and "LIMIT" in query["sql"])
+        self.assertIn('"inventory_productvariant"."price"', variants_sql)
+        self.assertNotIn('"inventory_productvariant"."created_by"', variants_sql)
+
+    def test_movement_inventory_list_accepts_bounded_page_size(self):
+        response = self.client.get(reverse("movement-inventory-list"), {"page_size": 4})
+        self.assertEqual(len(response.data["results"]), 4)
+        self.assertIsNotNone(response.data["next"])
+
+        response = self.client.get(reverse("movement-inventory-list"), {"page_size": 10_000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 6)
+
+    def test_product_variants_list_query_count_does_not_grow_with_variants(self):
+        # count + variantes (producto y stock en el mismo SELECT) + imágenes de sus productos
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("product-variants-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 6)
+        self.assertEqual({variant["stock"] for variant in response.data["results"]}, {1, 2, 3, 4, 5, 6})
+
+
+@override_settings(
+    STORE_MARGIN_GUARD_ENABLED=False,
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "TEST_REQUEST_DEFAULT_FORMAT": "json"},
+)
+class StorePublicApiTest(APITestCase):
+    DEFAULT_SHIPPING = MappingProxyType(
+        {
+            "department": "Cundinamarca",
+            "city": "Bogota",
+            "address_line1": "Calle 100 # 10-20",
+            "address_line2": "",
+            "reference": "Casa",
+            "postal_code": "110111",
+        }
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Los 4xx esperados no deben escribir warnings de django.request en cada test.
+        request_logger = logging.getLogger("django.request")
+        cls.addClassCleanup(request_logger.setLevel, request_logger.level)
+        request_logger.setLevel(logging.ERROR)
+        # Un solo mock de Wompi para toda la clase; setUp lo reinicia en cada test.
+        cls.mock_get_transaction = cls.enterClassContext(patch("inventory.store.views.get_transaction"))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.URL_CHECKOUT = reverse("store-checkout")
+        cls.URL_CART_VALIDATE = reverse("store-cart-validate")
+        cls.URL_PRODUCTS = reverse("store-products")
+        cls.URL_ORDER_LOOKUP = reverse("store-order-lookup")
+        cls.URL_SHIPPING_WEBHOOK = reverse("store-shipping-webhook")
+        cls.URL_OPS_ORDERS = reverse("store-ops-orders")
+        cls.URL_OPS_SUMMARY = reverse("store-ops-summary")
+
+        with transaction.atomic():
+            cls.ops_user = User.objects.create_superuser(
+                username="storeops",
+                email="storeops@example.com",
+            )
+            customers_group, _ = Group.objects.get_or_create(name="Customers")
+            # Ningún test valida sus contraseñas: se crean en un solo INSERT sin hashear
+            customers = [
+                User(
+                    username="cliente_store_tests",
+                    email="cliente_store_tests@example.com",
+                    first_name="Cliente",
+                    last_name="Tests",
+                ),
+                User(username="cliente_auth", email="cliente_auth@web.com"),
+                User(username="cliente_orders", email="cliente_orders@web.com"),
+            ]
+            for customer in customers:
+                customer.set_unusable_password()
+            cls.customer_user, cls.auth_customer, cls.orders_customer = User.objects.bulk_create(customers)
+            customers_group.user_set.add(cls.customer_user, cls.auth_customer)
+            cls.product = Product.objects.create(
+                name="Tenis Publicos",
+                brand="Golos",
+                description="Modelo para tienda online",
+                created_by="system",
+                updated_by="system",
+            )
+            cls.variant = ProductVariant.objects.create(
+                product=cls.product,
+                gender="unisex",
+                color="Negro",
+                size="40",
+                price=_D_199_90,
+                cost=_D_120,
+                stock_minimum=2,
+                created_by="system",
+                updated_by="system",
+                active=True,
+            )
+            MovementInventory.objects.create(
+                variant=cls.variant,
+                movement_type=MovementInventory.MovementType.PURCHASE,
+                quantity=8,
+                created_by="system",
+            )
+            ProductImage.objects.create(
+                product=cls.product,
+                variant=cls.variant,
+                image="products/store-variant.jpg",
+                is_primary=True,
+                alt_text="Imagen variante principal",
+                created_by="system",
+                updated_by="system",
+            )
+            cls.pending_sale = Sale.objects.create(
+                customer="Cliente Pedido (3115557788)",
+                created_by=cls.customer_user.username,
+                is_order=True,
+                total=_D_199_90,
+                status="pending",
+                payment_status="unpaid",
+            )
+            SaleDetail.objects.bulk_create(
+                [
+                    SaleDetail(
+                        sale=cls.pending_sale,
+                        variant=cls.variant,
+                        quantity=1,
+                        price=_D_199_90,
+                        subtotal=_D_199_90,
+                    )
+                ]
+            )
+        cls.pending_sale_id = cls.pending_sale.id
+
+    def setUp(self):
+        cache.clear()
+        self.mock_get_transaction.reset_mock(return_value=True, side_effect=True)
+        self.anon_client = APIClient()
+        self.customer_client = APIClient()
+        self.customer_client.force_authenticate(user=self.customer_user)
+        self.ops_client = APIClient()
+        self.ops_client.force_authenticate(user=self.ops_user)
+
+    def _ensure_related_fixtures(self):
+        """Crea los productos secundarios solo en los tests de catalogo que los usan."""
+        if hasattr(self, "product_b"):
+            return
+        with transaction.atomic():
+            self.product_b, self.product_c = Product.objects.bulk_create(
+                [
+                    Product(
+                        name="Botas Urbanas",
+                        brand="Golos",
+                        description="Segundo producto para filtros",
+                        product_type="boots",
+                        created_by="system",
+                        updated_by="system",
+                    ),
+                    Product(
+                        name="Sandalia Riviera",
+                        brand="Costa",
+                        description="Tercer producto para relacionados",
+                        product_type="sandals",
+                        created_by="system",
+                        updated_by="system",
+                    ),
+                ]
+            )
+            self.variant_b, self.variant_c = ProductVariant.objects.bulk_create(
+                [
+                    ProductVariant(
+                        product=self.product_b,
+                        gender="female",
+                        color="Cafe",
+                        size="38",
+                        price=_D_249_90,
+                        cost=_D_140,
+                        stock_minimum=1,
+                        created_by="system",
+                        updated_by="system",
+                        active=True,
+                    ),
+                    ProductVariant(
+                        product=self.product_c,
+                        gender="female",
+                        color="Beige",
+                        size="37",
+                        price=_D_179_90,
+                        cost=_D_90,
+                        stock_minimum=1,
+                        created_by="system",
+                        updated_by="system",
+                        active=True,
+                    ),
+                ]
+            )
+            MovementInventory.objects.bulk_create(
+                [
+                    MovementInventory(
+                        variant=self.variant_b,
+                        movement_type=MovementInventory.MovementType.PURCHASE,
+                        quantity=4,
+                        created_by="system",
+                    ),
+                    MovementInventory(
+                        variant=self.variant_c,
+                        movement_type=MovementInventory.MovementType.PURCHASE,
+                        quantity=3,
+                        created_by="system",
+                    ),
+                ]
+            )
 
     def _checkout_as_customer(self, payload: dict):
         if "shipping_address" not in payload:
-            payload = {
-                **payload,
-                "shipping_address": {
-                    "department": "Cundinamarca",
-                    "city": "Bogota",
-                    "address_line1": "Calle 100 # 10-20",
-                    "address_line2": "",
-                    "reference": "Casa",
-                    "postal_code": "110111",
-                    "recipient_name": payload.get("customer_name") or "Cliente Test",
-                    "recipient_phone": payload.get("customer_contact") or "3000000000",
-                },
+            payload["shipping_address"] = {
+                **self.DEFAULT_SHIPPING,
+                "recipient_name": payload.get("customer_name") or "Cliente Test",
+                "recipient_phone": payload.get("customer_contact") or "3000000000",
             }
-        self.client.force_authenticate(user=self.customer_user)
-        response = self.client.post(reverse("store-checkout"), payload, format="json")
-        self.client.force_authenticate(user=None)
-        return response
+        return self.customer_client.post(self.URL_CHECKOUT, payload, format="json")
+
+    def _prime_paid_pending_order(self, *, contact: str, ref: str) -> int:
+        """Crea directamente un pedido pendiente con referencia de pago, sin pasar por el checkout HTTP."""
+        with transaction.atomic():
+            sale = Sale.objects.create(
+                customer=f"Cliente Wompi ({contact})",
+                created_by=self.customer_user.username,
+                is_order=True,
+                total=self.variant.price,
+                status="pending",
+                payment_status="unpaid",
+                payment_reference=ref,
+                shipping_address={
+                    **self.DEFAULT_SHIPPING,
+                    "recipient_name": "Cliente Wompi",
+                    "recipient_phone": contact,
+                },
+            )
+            SaleDetail.objects.bulk_create(
+                [
+                    SaleDetail(
+                        sale=sale,
+                        variant=self.variant,
+                        quantity=1,
+                        price=self.variant.price,
+                        subtotal=self.variant.price,
+                    )
+                ]
+            )
+        return sale.id
+
+    def _build_sale(
+        self,
+        *,
+        status: str = "paid",
+        payment_status: str = "paid",
+        total: str = "100.00",
+        minutes_ago: int | None = 5,
+        **extra,
+    ) -> Sale:
+        """Arma un pedido de tienda sin guardarlo; minutes_ago=None deja paid_at vacio."""
+        paid_at = _now() - timedelta(minutes=minutes_ago) if minutes_ago is not None else None
+        return Sale(
+            customer=extra.pop("customer", "Cliente Test"),
+            created_by=extra.pop("created_by", "store_api"),
+            is_order=True,
+            status=status,
+            payment_status=payment_status,
+            total=Decimal(total),
+            paid_at=paid_at,
+            **extra,
+        )
+
+    def _make_sale(self, **kwargs) -> Sale:
+        """Crea un pedido de tienda (ver _build_sale)."""
+        sale = self._build_sale(**kwargs)
+        sale.save()
+        return sale
 
     def test_store_products_list_is_public(self):
-        response = self.client.get(reverse("store-products"))
+        self._ensure_related_fixtures()
+        # count + productos + prefetch de variantes e imagenes
+        with self.assertNumQueries(4):
+            response = self.anon_client.get(self.URL_PRODUCTS)
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_PRODUCTS_OK")
         self.assertGreaterEqual(response.data["count"], 1)
         self.assertIn("page", response.data)
         self.assertIn("page_size", response.data)
-        returned_products = response.data["products"]
-        returned_names = [item["name"] for item in returned_products]
-        self.assertIn(self.product.name, returned_names)
-        target_product = next(item for item in returned_products if item["name"] == self.product.name)
+        products_by_id = {item["id"]: item for item in response.data["products"]}
+        self.assertIn(self.product.id, products_by_id)
+        target_product = products_by_id[self.product.id]
         self.assertIsNotNone(target_product["image_url"])
         self.assertGreaterEqual(len(target_product["images"]), 1)
 
     def test_store_cart_validate_returns_total_and_items(self):
         payload = {"items": [{"variant_id": self.variant.id, "quantity": 2}]}
 
-        response = self.client.post(reverse("store-cart-validate"), payload, format="json")
+        response = self.anon_client.post(self.URL_CART_VALIDATE, payload, format="json")
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_CART_VALID")
@@ -911,6 +1421,16 @@ class StorePublicApiTest(APITestCase):
         self.assertIn("commercial", response.data)
         self.assertIn("is_viable_online", response.data["commercial"])
 
+    @skipUnless(connection.vendor == "postgresql", "jsonb_agg solo existe en PostgreSQL")
+    def test_sale_details_json_matches_queried_details(self):
+        sale = Sale.objects.with_details_json().get(pk=self.pending_sale_id)
+        # Los detalles llegan en la misma fila de la venta
+        with self.assertNumQueries(0):
+            items = _serialize_sale_items(sale)
+
+        self.assertEqual(len(sale.details_json), 1)
+        self.assertEqual(items, _serialize_sale_items(Sale.objects.get(pk=self.pending_sale_id)))
+
     def test_store_checkout_creates_pending_sale(self):
         payload = {
             "customer_name": "Cliente Web",
@@ -966,7 +1486,7 @@ class StorePublicApiTest(APITestCase):
             "items": [{"variant_id": self.variant.id, "quantity": 1}],
             "is_order": True,
         }
-        response = self.client.post(reverse("store-checkout"), payload, format="json")
+        response = self.anon_client.post(self.URL_CHECKOUT, payload, format="json")
         self.assertEqual(response.status_code, 401)
 
     def test_store_checkout_fails_if_stock_is_insufficient(self):
@@ -981,7 +1501,9 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(response.data["code"], "STORE_CHECKOUT_FAILED")
 
     def test_store_products_pagination_and_ordering(self):
-        response = self.client.get(f"{reverse('store-products')}?page=1&page_size=1&ordering=-name")
+        self._ensure_related_fixtures()
+        with self.assertNumQueries(4):
+            response = self.anon_client.get(f"{self.URL_PRODUCTS}?page=1&page_size=1&ordering=-name")
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_PRODUCTS_OK")
@@ -990,33 +1512,44 @@ class StorePublicApiTest(APITestCase):
         self.assertTrue(response.data["has_next"])
         self.assertEqual(len(response.data["products"]), 1)
 
+    def test_store_products_pagination_query_count_is_stable_across_pages(self):
+        self._ensure_related_fixtures()
+        url = f"{self.URL_PRODUCTS}?page_size=1&ordering=-name"
+
+        with CaptureQueriesContext(connection) as first_page:
+            first_response = self.anon_client.get(f"{url}&page=1")
+        with CaptureQueriesContext(connection) as second_page:
+            second_response = self.anon_client.get(f"{url}&page=2")
+
+        self.assertEqual(first_response.status_code, 200)
+        self.assertEqual(second_response.status_code, 200)
+        self.assertLessEqual(len(second_page), len(first_page))
+        count_queries = [q for q in second_page.captured_queries if "COUNT(" in q["sql"].upper()]
+        self.assertEqual(len(count_queries), 1)
+
     def test_store_featured_products_endpoint(self):
-        response = self.client.get(reverse("store-featured-products"))
+        self._ensure_related_fixtures()
+        response = self.anon_client.get(reverse("store-featured-products"))
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_FEATURED_PRODUCTS_OK")
         self.assertGreaterEqual(response.data["count"], 1)
 
     def test_store_related_products_endpoint(self):
-        response = self.client.get(reverse("store-related-products", args=[self.product.id]))
+        self._ensure_related_fixtures()
+        with self.assertNumQueries(4):
+            response = self.anon_client.get(reverse("store-related-products", args=[self.product.id]))
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_RELATED_PRODUCTS_OK")
-        related_names = [item["name"] for item in response.data["products"]]
+        related_names = {item["name"] for item in response.data["products"]}
         self.assertIn(self.product_b.name, related_names)
 
     def test_store_order_status_with_contact(self):
-        checkout_payload = {
-            "customer_name": "Cliente Pedido",
-            "customer_contact": "3115557788",
-            "items": [{"variant_id": self.variant.id, "quantity": 1}],
-            "is_order": True,
-        }
-        checkout_response = self._checkout_as_customer(checkout_payload)
-        sale_id = checkout_response.data["order"]["sale_id"]
+        sale_id = self.pending_sale_id
 
         status_url = f"{reverse('store-order-status', args=[sale_id])}?customer_contact=3115557788"
-        response = self.client.get(status_url)
+        response = self.anon_client.get(status_url)
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_ORDER_STATUS_OK")
@@ -1025,22 +1558,15 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(len(response.data["order"]["items"]), 1)
 
     def test_store_order_status_requires_contact(self):
-        response = self.client.get(reverse("store-order-status", args=[99999]))
+        response = self.anon_client.get(reverse("store-order-status", args=[99999]))
 
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.data["code"], "STORE_ORDER_CONTACT_REQUIRED")
 
     def test_store_order_lookup_by_sale_id(self):
-        checkout_payload = {
-            "customer_name": "Cliente Lookup ID",
-            "customer_contact": "3000001000",
-            "items": [{"variant_id": self.variant.id, "quantity": 1}],
-            "is_order": True,
-        }
-        checkout_response = self._checkout_as_customer(checkout_payload)
-        sale_id = checkout_response.data["order"]["sale_id"]
+        sale_id = self.pending_sale_id
 
-        response = self.client.get(f"{reverse('store-order-lookup')}?sale_id={sale_id}")
+        response = self.anon_client.get(f"{self.URL_ORDER_LOOKUP}?sale_id={sale_id}")
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_ORDER_LOOKUP_OK")
         self.assertEqual(response.data["count"], 1)
@@ -1056,9 +1582,11 @@ class StorePublicApiTest(APITestCase):
             }
             self._checkout_as_customer(payload)
 
-        response = self.client.get(
-            f"{reverse('store-order-lookup')}?customer=Cliente Lookup&customer_contact=3001002"
-        )
+        # pedidos + detalles con variante y producto + envio por cada pedido
+        with self.assertNumQueries(4):
+            response = self.anon_client.get(
+                f"{self.URL_ORDER_LOOKUP}?customer=Cliente Lookup&customer_contact=3001002"
+            )
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_ORDER_LOOKUP_OK")
         self.assertGreaterEqual(response.data["count"], 2)
@@ -1072,7 +1600,7 @@ class StorePublicApiTest(APITestCase):
         }
         self._checkout_as_customer(payload)
 
-        response = self.client.get(f"{reverse('store-order-lookup')}?customer=Cliente Privado")
+        response = self.anon_client.get(f"{self.URL_ORDER_LOOKUP}?customer=Cliente Privado")
         self.assertEqual(response.status_code, 400)
         self.assertEqual(response.data["code"], "STORE_ORDER_LOOKUP_CONTACT_REQUIRED")
 
@@ -1095,7 +1623,7 @@ class StorePublicApiTest(APITestCase):
             WOMPI_INTEGRITY_SECRET="int_test_x",
             WOMPI_REDIRECT_URL="http://localhost:8080/store/order-status",
         ):
-            response = self.client.post(reverse("store-order-pay", args=[sale_id]), pay_payload, format="json")
+            response = self.anon_client.post(reverse("store-order-pay", args=[sale_id]), pay_payload, format="json")
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_ORDER_PAYMENT_CHECKOUT_READY")
@@ -1105,21 +1633,10 @@ class StorePublicApiTest(APITestCase):
         self.assertIn("checkout_url", response.data["payment"])
         self.assertIn("checkout.wompi.co", response.data["payment"]["checkout_url"])
 
-    @patch("inventory.store.views.get_transaction")
-    def test_store_wompi_verify_updates_order_to_paid(self, mock_get_transaction):
-        checkout_payload = {
-            "customer_name": "Cliente Verify",
-            "customer_contact": "3001112222",
-            "items": [{"variant_id": self.variant.id, "quantity": 1}],
-            "is_order": True,
-        }
-        checkout_response = self._checkout_as_customer(checkout_payload)
-        sale_id = checkout_response.data["order"]["sale_id"]
-        sale = Sale.objects.get(id=sale_id)
-        sale.payment_reference = "ORD-VERIFY-123"
-        sale.save(update_fields=["payment_reference"])
+    def test_store_wompi_verify_updates_order_to_paid(self):
+        sale_id = self._prime_paid_pending_order(contact="3001112222", ref="ORD-VERIFY-123")
 
-        mock_get_transaction.return_value = {
+        self.mock_get_transaction.return_value = {
             "data": {
                 "id": "tx_test_123",
                 "status": "APPROVED",
@@ -1132,9 +1649,7 @@ class StorePublicApiTest(APITestCase):
             "customer_contact": "3001112222",
             "transaction_id": "tx_test_123",
         }
-        self.client.force_authenticate(user=self.customer_user)
-        response = self.client.post(reverse("store-order-wompi-verify", args=[sale_id]), verify_payload, format="json")
-        self.client.force_authenticate(user=None)
+        response = self.customer_client.post(reverse("store-order-wompi-verify", args=[sale_id]), verify_payload, format="json")
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_WOMPI_PAYMENT_SYNCED")
@@ -1155,21 +1670,10 @@ class StorePublicApiTest(APITestCase):
         STORE_SHIPPING_CARRIER_NAME="TestCarrier",
         STORE_SHIPPING_SERVICES="eco:9000:72,express:15000:24",
     )
-    @patch("inventory.store.views.get_transaction")
-    def test_store_wompi_verify_creates_shipment_for_paid_order(self, mock_get_transaction):
-        checkout_payload = {
-            "customer_name": "Cliente Shipment",
-            "customer_contact": "3002223333",
-            "items": [{"variant_id": self.variant.id, "quantity": 1}],
-            "is_order": True,
-        }
-        checkout_response = self._checkout_as_customer(checkout_payload)
-        sale_id = checkout_response.data["order"]["sale_id"]
-        sale = Sale.objects.get(id=sale_id)
-        sale.payment_reference = "ORD-SHIP-123"
-        sale.save(update_fields=["payment_reference"])
+    def test_store_wompi_verify_creates_shipment_for_paid_order(self):
+        sale_id = self._prime_paid_pending_order(contact="3002223333", ref="ORD-SHIP-123")
 
-        mock_get_transaction.return_value = {
+        self.mock_get_transaction.return_value = {
             "data": {
                 "id": "tx_ship_123",
                 "status": "APPROVED",
@@ -1182,9 +1686,7 @@ class StorePublicApiTest(APITestCase):
             "customer_contact": "3002223333",
             "transaction_id": "tx_ship_123",
         }
-        self.client.force_authenticate(user=self.customer_user)
-        response = self.client.post(reverse("store-order-wompi-verify", args=[sale_id]), verify_payload, format="json")
-        self.client.force_authenticate(user=None)
+        response = self.customer_client.post(reverse("store-order-wompi-verify", args=[sale_id]), verify_payload, format="json")
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["order"]["status"], "paid")
@@ -1205,21 +1707,10 @@ class StorePublicApiTest(APITestCase):
         STORE_SHIPPING_SERVICES="eco:9000:72,express:15000:24",
     )
     @patch("inventory.store.shipping._http_json")
-    @patch("inventory.store.views.get_transaction")
-    def test_store_wompi_verify_creates_http_provider_shipment(self, mock_get_transaction, mock_http_json):
-        checkout_payload = {
-            "customer_name": "Cliente Provider HTTP",
-            "customer_contact": "3005550000",
-            "items": [{"variant_id": self.variant.id, "quantity": 1}],
-            "is_order": True,
-        }
-        checkout_response = self._checkout_as_customer(checkout_payload)
-        sale_id = checkout_response.data["order"]["sale_id"]
-        sale = Sale.objects.get(id=sale_id)
-        sale.payment_reference = "ORD-SHIP-HTTP-1"
-        sale.save(update_fields=["payment_reference"])
+    def test_store_wompi_verify_creates_http_provider_shipment(self, mock_http_json):
+        sale_id = self._prime_paid_pending_order(contact="3005550000", ref="ORD-SHIP-HTTP-1")
 
-        mock_get_transaction.return_value = {
+        self.mock_get_transaction.return_value = {
             "data": {
                 "id": "tx_ship_http_1",
                 "status": "APPROVED",
@@ -1244,9 +1735,7 @@ class StorePublicApiTest(APITestCase):
             "customer_contact": "3005550000",
             "transaction_id": "tx_ship_http_1",
         }
-        self.client.force_authenticate(user=self.customer_user)
-        response = self.client.post(reverse("store-order-wompi-verify", args=[sale_id]), verify_payload, format="json")
-        self.client.force_authenticate(user=None)
+        response = self.customer_client.post(reverse("store-order-wompi-verify", args=[sale_id]), verify_payload, format="json")
 
         self.assertEqual(response.status_code, 200)
         shipment = Shipment.objects.filter(sale_id=sale_id).first()
@@ -1257,14 +1746,12 @@ class StorePublicApiTest(APITestCase):
 
     @override_settings(STORE_SHIPPING_WEBHOOK_SECRET="ship_secret")
     def test_store_shipping_webhook_updates_status_and_is_idempotent(self):
-        sale = Sale.objects.create(
+        sale = self._make_sale(
             customer="Cliente Webhook",
-            created_by="store_api",
-            is_order=True,
             status="processing",
-            payment_status="paid",
-            total=Decimal("120.00"),
-            confirmed_at=timezone.now() - timedelta(hours=3),
+            total="120.00",
+            minutes_ago=None,
+            confirmed_at=_now() - timedelta(hours=3),
         )
         shipment = Shipment.objects.create(
             sale=sale,
@@ -1283,13 +1770,13 @@ class StorePublicApiTest(APITestCase):
             "event_type": "delivered",
             "tracking_number": shipment.tracking_number,
         }
-        signature = shipping_webhook_signature(
-            json.dumps(payload, separators=(",", ":"), ensure_ascii=False),
+        signature = _sig(
+            _dumps(payload, separators=(",", ":"), ensure_ascii=False),
             "ship_secret",
         )
 
-        response = self.client.post(
-            reverse("store-shipping-webhook"),
+        response = self.anon_client.post(
+            self.URL_SHIPPING_WEBHOOK,
             payload,
             format="json",
             HTTP_X_STORE_SHIPPING_SIGNATURE=signature,
@@ -1302,8 +1789,8 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(shipment.status, Shipment.ShipmentStatus.DELIVERED)
         self.assertEqual(ShipmentEvent.objects.filter(provider_event_id="evt_ship_1").count(), 1)
 
-        duplicate_response = self.client.post(
-            reverse("store-shipping-webhook"),
+        duplicate_response = self.anon_client.post(
+            self.URL_SHIPPING_WEBHOOK,
             payload,
             format="json",
             HTTP_X_STORE_SHIPPING_SIGNATURE=signature,
@@ -1320,15 +1807,7 @@ class StorePublicApiTest(APITestCase):
         STORE_AUTO_TO_COMPLETED_MINUTES=99999,
     )
     def test_auto_advance_command_moves_paid_to_processing(self):
-        sale = Sale.objects.create(
-            customer="Cliente Auto",
-            created_by="store_api",
-            is_order=True,
-            status="paid",
-            payment_status="paid",
-            total=Decimal("100.00"),
-            paid_at=timezone.now() - timedelta(minutes=10),
-        )
+        sale = self._make_sale(customer="Cliente Auto", minutes_ago=10)
 
         call_command("auto_advance_store_orders")
 
@@ -1338,15 +1817,7 @@ class StorePublicApiTest(APITestCase):
 
     @override_settings(STORE_AUTO_ADVANCE_ENABLED=False)
     def test_auto_advance_command_respects_disabled_setting(self):
-        sale = Sale.objects.create(
-            customer="Cliente Auto Off",
-            created_by="store_api",
-            is_order=True,
-            status="paid",
-            payment_status="paid",
-            total=Decimal("100.00"),
-            paid_at=timezone.now() - timedelta(minutes=30),
-        )
+        sale = self._make_sale(customer="Cliente Auto Off", minutes_ago=30)
 
         call_command("auto_advance_store_orders")
 
@@ -1354,17 +1825,8 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(sale.status, "paid")
 
     def test_store_order_status_includes_timeline_and_status_detail(self):
-        checkout_payload = {
-            "customer_name": "Cliente Timeline",
-            "customer_contact": "3119990000",
-            "items": [{"variant_id": self.variant.id, "quantity": 1}],
-            "is_order": True,
-        }
-        checkout_response = self._checkout_as_customer(checkout_payload)
-        sale_id = checkout_response.data["order"]["sale_id"]
-
-        response = self.client.get(
-            f"{reverse('store-order-status', args=[sale_id])}?customer_contact=3119990000"
+        response = self.anon_client.get(
+            f"{reverse('store-order-status', args=[self.pending_sale_id])}?customer_contact=3115557788"
         )
 
         self.assertEqual(response.status_code, 200)
@@ -1374,25 +1836,54 @@ class StorePublicApiTest(APITestCase):
         self.assertGreaterEqual(len(response.data["order"]["timeline"]), 1)
 
     def test_store_ops_orders_list_requires_auth_and_returns_orders(self):
-        unauth_response = self.client.get(reverse("store-ops-orders"))
+        unauth_response = self.anon_client.get(self.URL_OPS_ORDERS)
         self.assertEqual(unauth_response.status_code, 401)
 
-        self.client.force_authenticate(user=self.ops_user)
-        auth_response = self.client.get(reverse("store-ops-orders"))
+        with self.assertNumQueries(4):
+            auth_response = self.ops_client.get(self.URL_OPS_ORDERS)
         self.assertEqual(auth_response.status_code, 200)
         self.assertEqual(auth_response.data["code"], "STORE_OPS_ORDERS_OK")
         self.assertIn("orders", auth_response.data)
 
+    def test_store_ops_orders_list_loads_items_in_one_query(self):
+        sales = Sale.objects.bulk_create(
+            [self._build_sale(customer=f"Cliente Items {index}", total="199.90") for index in range(3)]
+        )
+        SaleDetail.objects.bulk_create(
+            [
+                SaleDetail(sale=sale, variant=self.variant, quantity=1, price=self.variant.price, subtotal=self.variant.price)
+                for sale in sales
+            ]
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.ops_client.get(self.URL_OPS_ORDERS)
+
+        self.assertEqual(response.status_code, 200)
+        details_queries = [query for query in queries.captured_queries if 'FROM "inventory_saledetail"' in query["sql"]]
+        self.assertEqual(len(details_queries), 1)
+        items = {order["sale_id"]: order["items"] for order in response.data["orders"]}
+        self.assertEqual(
+            items[sales[0].id],
+            [
+                {
+                    "variant_id": self.variant.id,
+                    "product_name": "Tenis Publicos",
+                    "variant_info": "Unisex - Negro - 40",
+                    "quantity": 1,
+                    "unit_price": "199.90",
+                    "subtotal": "199.90",
+                }
+            ],
+        )
+
     def test_store_ops_summary_reports_orders_missing_inventory_discount(self):
-        sale = Sale.objects.create(
+        sale = self._make_sale(
             customer="Cliente Riesgo Inventario",
-            created_by="store_api",
-            is_order=True,
             status="processing",
-            payment_status="paid",
-            total=Decimal("199.90"),
-            paid_at=timezone.now() - timedelta(minutes=20),
-            confirmed_at=timezone.now() - timedelta(minutes=10),
+            total="199.90",
+            minutes_ago=20,
+            confirmed_at=_now() - timedelta(minutes=10),
         )
         SaleDetail.objects.create(
             sale=sale,
@@ -1402,8 +1893,7 @@ class StorePublicApiTest(APITestCase):
             subtotal=self.variant.price,
         )
 
-        self.client.force_authenticate(user=self.ops_user)
-        response = self.client.get(reverse("store-ops-summary"))
+        response = self.ops_client.get(self.URL_OPS_SUMMARY)
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_OPS_SUMMARY_OK")
@@ -1421,8 +1911,7 @@ class StorePublicApiTest(APITestCase):
         checkout_response = self._checkout_as_customer(checkout_payload)
         sale_id = checkout_response.data["order"]["sale_id"]
 
-        self.client.force_authenticate(user=self.ops_user)
-        response = self.client.patch(
+        response = self.ops_client.patch(
             reverse("store-ops-order-status", args=[sale_id]),
             {"status": "paid", "note": "Pago validado en caja"},
             format="json",
@@ -1440,17 +1929,8 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(movement.quantity, -1)
 
     def test_store_ops_can_register_manual_shipment(self):
-        sale = Sale.objects.create(
-            customer="Cliente Manual",
-            created_by="store_api",
-            is_order=True,
-            status="paid",
-            payment_status="paid",
-            total=Decimal("150.00"),
-            paid_at=timezone.now() - timedelta(minutes=10),
-        )
+        sale = self._make_sale(customer="Cliente Manual", total="150.00", minutes_ago=10)
 
-        self.client.force_authenticate(user=self.ops_user)
         payload = {
             "carrier": "Servientrega",
             "tracking_number": "GUIA-001-ABC",
@@ -1458,7 +1938,7 @@ class StorePublicApiTest(APITestCase):
             "service": "mostrador",
             "status": "in_transit",
         }
-        response = self.client.post(
+        response = self.ops_client.post(
             reverse("store-ops-order-shipment-manual", args=[sale.id]),
             payload,
             format="json",
@@ -1473,23 +1953,11 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(shipment.carrier, "Servientrega")
 
     def test_store_ops_manual_shipment_rejects_duplicate_tracking(self):
-        sale_a = Sale.objects.create(
-            customer="Cliente A",
-            created_by="store_api",
-            is_order=True,
-            status="paid",
-            payment_status="paid",
-            total=Decimal("80.00"),
-            paid_at=timezone.now() - timedelta(minutes=5),
-        )
-        sale_b = Sale.objects.create(
-            customer="Cliente B",
-            created_by="store_api",
-            is_order=True,
-            status="paid",
-            payment_status="paid",
-            total=Decimal("90.00"),
-            paid_at=timezone.now() - timedelta(minutes=5),
+        sale_a, sale_b = Sale.objects.bulk_create(
+            [
+                self._build_sale(customer="Cliente A", total="80.00"),
+                self._build_sale(customer="Cliente B", total="90.00"),
+            ]
         )
         Shipment.objects.create(
             sale=sale_a,
@@ -1502,14 +1970,13 @@ class StorePublicApiTest(APITestCase):
             created_by="storeops",
         )
 
-        self.client.force_authenticate(user=self.ops_user)
         payload = {
             "carrier": "Servientrega",
             "tracking_number": "GUIA-DUP-123",
             "shipping_cost": "9500.00",
             "status": "in_transit",
         }
-        response = self.client.post(
+        response = self.ops_client.post(
             reverse("store-ops-order-shipment-manual", args=[sale_b.id]),
             payload,
             format="json",
@@ -1527,16 +1994,17 @@ class StorePublicApiTest(APITestCase):
             "last_name": "Web",
         }
 
-        register_response = self.client.post(reverse("store-customer-register"), register_payload, format="json")
+        register_response = self.anon_client.post(reverse("store-customer-register"), register_payload, format="json")
         self.assertEqual(register_response.status_code, 201)
         self.assertEqual(register_response.data["code"], "STORE_CUSTOMER_REGISTERED")
         self.assertIn("access", register_response.data)
         self.assertIn("refresh", register_response.data)
+        self.assertEqual(register_response.data["user"]["groups"], ["Customers"])
 
         user = User.objects.get(username="cliente_web_1")
         self.assertTrue(user.groups.filter(name="Customers").exists())
 
-        login_response = self.client.post(
+        login_response = self.anon_client.post(
             reverse("store-customer-login"),
             {"username": "cliente_web_1", "password": "secret1234"},
             format="json",
@@ -1544,17 +2012,10 @@ class StorePublicApiTest(APITestCase):
         self.assertEqual(login_response.status_code, 200)
         self.assertEqual(login_response.data["code"], "STORE_CUSTOMER_LOGIN_OK")
         self.assertIn("access", login_response.data)
+        self.assertEqual(login_response.data["user"]["groups"], ["Customers"])
 
     def test_store_checkout_uses_authenticated_user_as_creator(self):
-        customers_group, _ = Group.objects.get_or_create(name="Customers")
-        customer_user = User.objects.create_user(
-            username="cliente_auth",
-            email="cliente_auth@web.com",
-            password="secret1234",
-            is_staff=False,
-        )
-        customer_user.groups.add(customers_group)
-        self.client.force_authenticate(user=customer_user)
+        self.client.force_authenticate(user=self.auth_customer)
 
         payload = {
             "customer_name": "Cliente Auth",
@@ -1569,38 +2030,37 @@ class StorePublicApiTest(APITestCase):
                 "recipient_phone": "3007770000",
             },
         }
-        response = self.client.post(reverse("store-checkout"), payload, format="json")
+        response = self.client.post(self.URL_CHECKOUT, payload, format="json")
 
         self.assertEqual(response.status_code, 201)
         sale_id = response.data["order"]["sale_id"]
         sale = Sale.objects.get(id=sale_id)
         self.assertEqual(sale.created_by, "cliente_auth")
+        self.assertEqual(sale.created_by_user_id, self.auth_customer.id)
 
     def test_store_my_orders_returns_only_authenticated_customer_orders(self):
-        customer_user = User.objects.create_user(
-            username="cliente_orders",
-            email="cliente_orders@web.com",
-            password="secret1234",
-            is_staff=False,
-        )
-        Sale.objects.create(
-            customer="Cliente Orders",
-            created_by="cliente_orders",
-            is_order=True,
-            total=Decimal("10.00"),
-            status="pending",
-            payment_status="unpaid",
-        )
-        Sale.objects.create(
-            customer="Otro Cliente",
-            created_by="store_api",
-            is_order=True,
-            total=Decimal("12.00"),
-            status="pending",
-            payment_status="unpaid",
+        Sale.objects.bulk_create(
+            [
+                self._build_sale(
+                    customer="Cliente Orders",
+                    created_by="cliente_orders",
+                    created_by_user=self.orders_customer,
+                    status="pending",
+                    payment_status="unpaid",
+                    total="10.00",
+                    minutes_ago=None,
+                ),
+                self._build_sale(
+                    customer="Otro Cliente",
+                    status="pending",
+                    payment_status="unpaid",
+                    total="12.00",
+                    minutes_ago=None,
+                ),
+            ]
         )
 
-        self.client.force_authenticate(user=customer_user)
+        self.client.force_authenticate(user=self.orders_customer)
         response = self.client.get(reverse("store-my-orders"))
 
         self.assertEqual(response.status_code, 200)
@@ -1616,7 +2076,7 @@ class StorePublicApiTest(APITestCase):
         WOMPI_API_BASE_URL="https://sandbox.wompi.co/v1",
     )
     def test_store_wompi_health_configured(self):
-        response = self.client.get(reverse("store-wompi-health"))
+        response = self.anon_client.get(reverse("store-wompi-health"))
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_WOMPI_HEALTH_OK")
@@ -1631,7 +2091,7 @@ class StorePublicApiTest(APITestCase):
         WOMPI_REDIRECT_URL="",
     )
     def test_store_wompi_health_reports_missing_keys(self):
-        response = self.client.get(reverse("store-wompi-health"))
+        response = self.anon_client.get(reverse("store-wompi-health"))
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_WOMPI_HEALTH_OK")
@@ -1640,7 +2100,7 @@ class StorePublicApiTest(APITestCase):
         self.assertIn("WOMPI_INTEGRITY_SECRET", response.data["missing"])
 
     def test_store_branding_public_endpoint(self):
-        response = self.client.get(reverse("store-branding"))
+        response = self.anon_client.get(reverse("store-branding"))
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_BRANDING_OK")
@@ -1648,7 +2108,6 @@ class StorePublicApiTest(APITestCase):
         self.assertIn("store_name", response.data["branding"])
 
     def test_store_ops_branding_update(self):
-        self.client.force_authenticate(user=self.ops_user)
         payload = {
             "store_name": "Golos Boutique",
             "tagline": "Estilo premium para cada paso",
@@ -1656,8 +2115,218 @@ class StorePublicApiTest(APITestCase):
             "hero_title": "Coleccion nueva 2026",
             "hero_subtitle": "Compra segura con entrega nacional",
         }
-        response = self.client.patch(reverse("store-ops-branding"), payload, format="json")
+        response = self.ops_client.patch(reverse("store-ops-branding"), payload, format="json")
 
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.data["code"], "STORE_OPS_BRANDING_UPDATED")
         self.assertEqual(response.data["branding"]["store_name"], "Golos Boutique")
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UserPermissionApiTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin_users", email="admin_users@example.com")
+        cls.sellers_group = Group.objects.create(name="Vendedores")
+        sellers = [User(username=f"vendedor_{index}", email=f"vendedor_{index}@example.com") for index in range(3)]
+        for seller in sellers:
+            seller.set_unusable_password()
+        cls.sellers_group.user_set.add(*User.objects.bulk_create(sellers))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_users_list_prefetches_groups(self):
+        # count + usuarios + prefetch de grupos, sin importar cuantos usuarios haya
+        with self.assertNumQueries(3) as queries:
+            response = self.client.get(reverse("users-list"))
+
+        self.assertEqual(response.status_code, 200)
+        users_by_name = {item["username"]: item for item in response.data["results"]}
+        self.assertEqual(users_by_name["vendedor_0"]["groups"], [{"id": self.sellers_group.id, "name": "Vendedores"}])
+        self.assertFalse(any('"auth_user"."password"' in query["sql"] for query in queries.captured_queries))
+
+    def test_user_create_reads_groups_once_for_the_response(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse("users-list"),
+                {
+                    "username": "vendedor_nuevo",
+                    "password": "ClaveSegura123",
+                    "group_ids": [self.sellers_group.id],
+                },
+                format="json",
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["groups"], [{"id": self.sellers_group.id, "name": "Vendedores"}])
+        self.assertEqual(response.data["group_ids"], [self.sellers_group.id])
+        insert_index = next(
+            index for index, query in enumerate(queries.captured_queries)
+            if 'INTO "auth_user_groups"' in query["sql"]
+        )
+        later_group_reads = [
+            query["sql"] for query in queries.captured_queries[insert_index + 1:]
+            if 'FROM "auth_group"' in query["sql"]
+        ]
+        # `groups` y `group_ids` comparten un único prefetch
+        self.assertEqual(len(later_group_reads), 1)
+
+    @skipUnless(connection.vendor == "postgresql", "jsonb_agg solo existe en PostgreSQL")
+    def test_permission_catalog_jsonb_matches_values_fallback(self):
+        queryset = Permission.objects.filter(content_type__app_label="inventory").order_by(
+            "content_type__model", "codename"
+        )
+        expected = list(permission_catalog_values(queryset))
+
+        # Todo el catálogo llega en una sola fila agregada
+        with self.assertNumQueries(1):
+            catalog = build_permission_catalog(queryset)
+
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(catalog, expected)
+
+    def test_permissions_list_only_returns_inventory_catalog(self):
+        # Un solo SELECT: el catálogo se pagina en memoria
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("permissions-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(response.data["count"], 0)
+        permissions_by_codename = {item["codename"]: item for item in response.data["results"]}
+        self.assertNotIn("add_user", permissions_by_codename)
+        add_sale = Permission.objects.get(codename="add_sale")
+        self.assertEqual(
+            permissions_by_codename["add_sale"],
+            {
+                "id": add_sale.id,
+                "name": add_sale.name,
+                "codename": "add_sale",
+                "content_type": add_sale.content_type_id,
+                "content_type_name": "sale",
+            },
+        )
+
+    def test_groups_nest_permission_details_and_accept_permission_ids(self):
+        permission = Permission.objects.get(codename="add_sale")
+
+        response = self.client.post(
+            reverse("groups-list"),
+            {"name": "Cajeros", "permission_ids": [permission.id]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            response.data["permissions"],
+            [
+                {
+                    "id": permission.id,
+                    "name": permission.name,
+                    "codename": "add_sale",
+                    "content_type": permission.content_type_id,
+                    "content_type_name": "sale",
+                }
+            ],
+        )
+
+    def test_groups_list_etag_changes_when_group_permissions_change(self):
+        etag = self.client.get(reverse("groups-list"))["ETag"]
+        self.assertEqual(self.client.get(reverse("groups-list"), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sellers_group.permissions.add(Permission.objects.get(codename="add_sale"))
+
+        response = self.client.get(reverse("groups-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["permissions"][0]["codename"], "add_sale")
+
+    def test_permissions_catalog_is_cached_until_permissions_change(self):
+        self.client.get(reverse("permissions-list"))
+        with self.assertNumQueries(0):
+            cached_response = self.client.get(reverse("permissions-list"))
+        self.assertEqual(cached_response.status_code, 200)
+
+        Permission.objects.create(
+            codename="aaa_export_catalog",
+            name="Can export catalog",
+            content_type=Permission.objects.get(codename="add_sale").content_type,
+        )
+
+        response = self.client.get(reverse("permissions-list"))
+        self.assertEqual(response.data["count"], cached_response.data["count"] + 1)
+
+    def test_me_groups_are_cached_and_refreshed_when_groups_change(self):
+        seller = User.objects.get(username="vendedor_0")
+        self.client.force_authenticate(user=seller)
+
+        response = self.client.get(reverse("users-me"))
+        self.assertEqual(response.data["groups"], ["Vendedores"])
+
+        managers_group = Group.objects.create(name="Gerentes")
+        managers_group.user_set.add(seller)
+
+        response = self.client.get(reverse("users-me"))
+        self.assertEqual(sorted(response.data["groups"]), ["Gerentes", "Vendedores"])
+
+    def test_jwt_user_lookup_is_cached_and_invalidated_on_save(self):
+        seller = User.objects.get(username="vendedor_1")
+        access = str(RefreshToken.for_user(seller).access_token)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+        with CaptureQueriesContext(connection) as first_request:
+            self.assertEqual(self.client.get(reverse("users-me")).status_code, 200)
+        with CaptureQueriesContext(connection) as second_request:
+            self.assertEqual(self.client.get(reverse("users-me")).status_code, 200)
+        self.assertEqual(len(second_request), len(first_request) - 2)  # usuario JWT + grupos cacheados
+
+        seller.is_active = False
+        seller.save(update_fields=["is_active"])
+        self.assertEqual(self.client.get(reverse("users-me")).status_code, 401)
+
+    def test_model_permissions_are_cached_and_invalidated_on_group_change(self):
+        seller = User.objects.get(username="vendedor_2")
+        add_group = Permission.objects.get(codename="add_group")
+        self.sellers_group.permissions.add(add_group)
+        access = str(RefreshToken.for_user(seller).access_token)
+        self.client.force_authenticate(user=None)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.client.get(reverse("users-me"))  # deja cacheado el usuario JWT
+
+        with CaptureQueriesContext(connection) as first_request:
+            response = self.client.post(reverse("groups-list"), {"name": "Bodega"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        with CaptureQueriesContext(connection) as second_request:
+            response = self.client.post(reverse("groups-list"), {"name": "Caja"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(second_request), len(first_request) - 2)  # permisos de usuario + de grupo
+
+        self.sellers_group.permissions.remove(add_group)
+        response = self.client.post(reverse("groups-list"), {"name": "Despachos"}, format="json")
+        self.assertEqual(response.status_code, 403)
+
+    def test_action_permission_classes_override_shared_instances(self):
+        self.client.get(reverse("users-list"))  # instancia los permisos por defecto del ViewSet
+        self.client.force_authenticate(user=None)
+
+        self.assertEqual(self.client.get(reverse("users-list")).status_code, 401)
+        response = self.client.post(
+            reverse("users-request-password-reset"),
+            {"email": "nadie@example.com"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_users_list_for_non_staff_selects_basic_columns_only(self):
+        seller = User.objects.get(username="vendedor_0")
+        self.client.force_authenticate(user=seller)
+
+        # count + usuarios; UserSerializer no expone grupos
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get(reverse("users-list"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data["results"][0]), {"id", "username", "email", "is_staff"})
+        self.assertNotIn('"auth_user"."first_name"', queries.captured_queries[-1]["sql"])
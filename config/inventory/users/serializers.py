@@ -3,10 +3,44 @@ Serializers para gestión de usuarios y grupos
 """
 from django.contrib.auth.models import User, Group, Permission
 from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, prefetch_related_objects
+from django.db.models.functions import JSONObject
 from django.utils.http import urlsafe_base64_decode
 from rest_framework import serializers
+from ..core.constants import USER_GROUPS_CACHE_KEY, USER_GROUPS_CACHE_TTL
+from ..core.serializers import CachedFieldsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+def user_group_names(user, request=None):
+    """
+    Obtener los nombres de grupos de un usuario.
+
+    Se reutiliza dentro del mismo request y se cachea por usuario
+    (se invalida en users/signals.py al cambiar sus grupos).
+
+    Args:
+        user: Instancia de User
+        request: Request actual, opcional
+
+    Returns:
+        list: Lista de nombres de grupos
+    """
+    is_request_user = request is not None and request.user.pk == user.pk
+    if is_request_user and hasattr(request, "_cached_user_groups"):
+        return request._cached_user_groups
+
+    group_names = cache.get_or_set(
+        USER_GROUPS_CACHE_KEY.format(user_id=user.pk),
+        lambda: list(user.groups.values_list("name", flat=True)),
+        USER_GROUPS_CACHE_TTL,
+    )
+    if is_request_user:
+        request._cached_user_groups = group_names
+    return group_names
+
+
+class UserSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer básico para usuarios"""
     class Meta:
         model = User
@@ -66,11 +100,14 @@ class UserCreateSerializer(serializers.ModelSerializer):
         user.set_password(password)
         user.save()
         if groups:
-            user.groups.set(groups)
+            # Usuario recién creado: add() evita que set() consulte los grupos actuales
+            user.groups.add(*groups)
+        # Una sola consulta de grupos para `groups` y `group_ids` en la respuesta
+        prefetch_related_objects([user], "groups")
         return user
 
 
-class UserManagementSerializer(serializers.ModelSerializer):
+class UserManagementSerializer(CachedFieldsMixin, serializers.ModelSerializer):
     """Serializer para gestionar usuarios existentes"""
     groups = serializers.SerializerMethodField(read_only=True)
     group_ids = serializers.PrimaryKeyRelatedField(
@@ -130,7 +167,7 @@ class UserMeSerializer(serializers.ModelSerializer):
         Returns:
             list: Lista de nombres de grupos
         """
-        return list(obj.groups.values_list("name", flat=True))
+        return user_group_names(obj, self.context.get("request"))
 
     class Meta:
         model = User
@@ -162,9 +199,67 @@ class UserMePasswordSerializer(serializers.Serializer):
         return value
 
 
+# Forma única de un permiso en la API: grupos anidados y catálogo de permisos
+PERMISSION_FIELDS = ("id", "name", "codename", "content_type")
+
+
+def permission_catalog_values(queryset):
+    """
+    Proyecta un queryset de permisos a dicts con la misma forma que PermissionMiniSerializer.
+
+    Args:
+        queryset: QuerySet de Permission
+
+    Returns:
+        QuerySet: Filas como dicts (id, name, codename, content_type, content_type_name)
+    """
+    return queryset.values(*PERMISSION_FIELDS, content_type_name=F("content_type__model"))
+
+
+def build_permission_catalog(queryset):
+    """
+    Materializa el catálogo de permisos como lista de dicts.
+
+    En PostgreSQL el arreglo JSON se arma en la BD con jsonb_agg(jsonb_build_object(...))
+    y llega en una sola fila; en otros motores se usa permission_catalog_values().
+
+    Args:
+        queryset: QuerySet de Permission (se respeta su order_by)
+
+    Returns:
+        list: Permisos como dicts (id, name, codename, content_type, content_type_name)
+    """
+    if connections[queryset.db].vendor != "postgresql":
+        return list(permission_catalog_values(queryset))
+
+    # Import diferido: contrib.postgres requiere el driver de PostgreSQL
+    from django.contrib.postgres.aggregates import JSONBAgg
+
+    catalog = queryset.aggregate(
+        data=JSONBAgg(
+            JSONObject(
+                **{name: name for name in PERMISSION_FIELDS},
+                content_type_name="content_type__model",
+            ),
+            order_by=queryset.query.order_by,
+        )
+    )
+    return catalog["data"] or []
+
+
+class PermissionMiniSerializer(serializers.ModelSerializer):
+    """Serializer compacto de permisos para anidar en grupos"""
+    content_type_name = serializers.CharField(source="content_type.model", read_only=True)
+
+    class Meta:
+        model = Permission
+        fields = [*PERMISSION_FIELDS, "content_type_name"]
+        read_only_fields = fields
+
+
 class GroupSerializer(serializers.ModelSerializer):
     """Serializer para gestión de grupos"""
-    permissions = serializers.SerializerMethodField(read_only=True)
+    permissions = PermissionMiniSerializer(many=True, read_only=True)
     permission_ids = serializers.PrimaryKeyRelatedField(
         queryset=Permission.objects.all(),
         many=True,
@@ -173,27 +268,6 @@ class GroupSerializer(serializers.ModelSerializer):
         source="permissions",
     )
 
-    def get_permissions(self, obj):
-        """
-        Obtener lista de permisos del grupo con detalles.
-        
-        Args:
-            obj: Instancia de Group
-            
-        Returns:
-            list: Lista de diccionarios con detalles de cada permiso
-        """
-        return [
-            {
-                "id": perm.id,
-                "name": perm.name,
-                "codename": perm.codename,
-                "content_type": perm.content_type_id,
-                "content_type_name": perm.content_type.model,
-            }
-            for perm in obj.permissions.all()
-        ]
-
     class Meta:
         model = Group
         fields = ["id", "name", "permissions", "permission_ids"]
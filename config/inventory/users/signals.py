@@ -1,5 +1,15 @@
+from django.contrib.auth.models import Group, Permission, User
 from django.contrib.auth.signals import user_logged_in
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete
 from django.dispatch import receiver
+from ..core.constants import (
+    JWT_USER_CACHE_KEY,
+    PERMISSION_CATALOG_CACHE_KEY,
+    USER_GROUPS_CACHE_KEY,
+    USER_PERMISSIONS_CACHE_KEY,
+)
+from ..core.http_cache import bump_model_versions
 from ..notifications.services import NotificationService
 
 @receiver(user_logged_in)
@@ -12,3 +22,99 @@ def notify_user_on_login(sender, request, user, **kwargs):
     except Exception:
         # No bloqueamos el login si falla la notificación
         pass
+
+
+@receiver(post_migrate)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permission_catalog(sender, **kwargs):
+    """
+    Invalida el catálogo de permisos cacheado cuando cambian los permisos
+    """
+    cache.delete(PERMISSION_CATALOG_CACHE_KEY)
+    bump_model_versions(Permission)
+
+
+# Acciones de m2m_changed tras las que cambian las relaciones
+M2M_CHANGE_ACTIONS = ("post_add", "post_remove", "pre_clear")
+
+
+def _m2m_owner_ids(instance, action, reverse, pk_set, reverse_accessor):
+    """
+    Ids del lado "dueño" de la relación m2m (el modelo que declara el campo)
+    afectados por un m2m_changed.
+    """
+    if not reverse:
+        return [instance.pk]
+    if action == "pre_clear":
+        return list(getattr(instance, reverse_accessor).values_list("pk", flat=True))
+    return list(pk_set or [])
+
+
+def _invalidate_user_permissions(user_ids):
+    cache.delete_many([USER_PERMISSIONS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_user_groups_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida los nombres de grupo y permisos cacheados de los usuarios afectados
+    """
+    if action not in M2M_CHANGE_ACTIONS:
+        return
+    user_ids = _m2m_owner_ids(instance, action, reverse, pk_set, "user_set")
+    cache.delete_many([USER_GROUPS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+    _invalidate_user_permissions(user_ids)
+
+
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_direct_permissions_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida los permisos cacheados al cambiar los permisos directos de usuarios
+    """
+    if action not in M2M_CHANGE_ACTIONS:
+        return
+    _invalidate_user_permissions(_m2m_owner_ids(instance, action, reverse, pk_set, "user_set"))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Invalida los permisos cacheados de los miembros de los grupos afectados
+    """
+    if action not in M2M_CHANGE_ACTIONS:
+        return
+    group_ids = _m2m_owner_ids(instance, action, reverse, pk_set, "group_set")
+    user_ids = User.objects.filter(groups__in=group_ids).values_list("pk", flat=True).distinct()
+    _invalidate_user_permissions(list(user_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_group_members_cache(sender, instance, **kwargs):
+    """
+    Invalida grupos y permisos cacheados de los miembros de un grupo que se elimina
+    (el borrado en cascada de la tabla intermedia no emite m2m_changed)
+    """
+    user_ids = list(instance.user_set.values_list("pk", flat=True))
+    cache.delete_many([USER_GROUPS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+    _invalidate_user_permissions(user_ids)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_jwt_user_cache(sender, instance, **kwargs):
+    """
+    Invalida el usuario cacheado por CachedJWTAuthentication
+    """
+    cache.delete(JWT_USER_CACHE_KEY.format(user_id=instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_etags(sender, **kwargs):
+    """
+    Invalida los ETag del listado de grupos cuando cambia un grupo o sus permisos
+    """
+    if kwargs.get("action", "post_add") in M2M_CHANGE_ACTIONS:
+        bump_model_versions(Group)
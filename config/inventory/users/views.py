@@ -5,6 +5,7 @@ from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User, Group, Permission
+from django.core.cache import cache
 from .serializers import (
     UserSerializer,
     UserCreateSerializer,
@@ -14,6 +15,7 @@ from .serializers import (
     PasswordResetRequestSerializer,
     PasswordResetConfirmSerializer,
     GroupSerializer,
+    build_permission_catalog,
 )
 from django.core.mail import send_mail
 from django.conf import settings
@@ -21,9 +23,14 @@ from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes
 from drf_spectacular.utils import extend_schema
+from ..core.constants import PERMISSION_CATALOG_CACHE_KEY, PERMISSION_CATALOG_CACHE_TTL
+from ..core.http_cache import ConditionalGetMixin
+from ..core.permissions import CachedDjangoModelPermissions, SharedPermissionInstancesMixin
+from ..core.serializers import SerializerByActionMixin, only_serialized_columns
+
 
 @extend_schema(tags=['Users'])
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SerializerByActionMixin, SharedPermissionInstancesMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de usuarios
     
@@ -33,24 +40,44 @@ class UserViewSet(viewsets.ModelViewSet):
     - Eliminación: Usuarios con permiso delete_user
     """
     queryset = User.objects.all()
-    permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
+    # Acciones con serializer fijo; las demás dependen de si el usuario es staff
+    serializer_class_by_action = {'create': UserCreateSerializer}
+    permission_classes = [permissions.IsAuthenticated, CachedDjangoModelPermissions]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ("list", "retrieve"):
+            # Solo las columnas que el serializer de lectura realmente expone
+            serializer_class = self.get_serializer_class()
+            queryset = only_serialized_columns(queryset, serializer_class)
+            if "groups" in serializer_class.Meta.fields:
+                # Los serializers de usuario recorren obj.groups.all() por fila
+                queryset = queryset.prefetch_related("groups")
+        return queryset
     
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Se resuelve una vez por request; get_serializer_class se invoca varias veces
+        self._serializer_cls = super().get_serializer_class()
+
     def get_serializer_class(self):
-        if self.action == 'create':
-            return UserCreateSerializer
-        elif self.request.user.is_staff:
+        # Fuera del ciclo normal (p. ej. generación del schema) no pasa por initial()
+        return getattr(self, "_serializer_cls", None) or super().get_serializer_class()
+
+    def get_default_serializer_class(self):
+        if self.request.user.is_staff:
             return UserManagementSerializer  # Campos administrativos para staff
         return UserSerializer  # Campos básicos para usuarios normales
 
     @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def me(self, request):
         """Endpoint para obtener/actualizar información del usuario actual"""
-        serializer = UserMeSerializer(request.user)
+        serializer = UserMeSerializer(request.user, context={"request": request})
         return Response(serializer.data)
 
     @me.mapping.patch
     def me_patch(self, request):
-        serializer = UserMeSerializer(request.user, data=request.data, partial=True)
+        serializer = UserMeSerializer(request.user, data=request.data, partial=True, context={"request": request})
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return Response(serializer.data)
@@ -110,7 +137,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
 
 @extend_schema(tags=['Groups'])
-class GroupViewSet(viewsets.ModelViewSet):
+class GroupViewSet(ConditionalGetMixin, SharedPermissionInstancesMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestión de grupos
     
@@ -120,12 +147,14 @@ class GroupViewSet(viewsets.ModelViewSet):
     - Eliminación: Usuarios con permiso delete_group
     """
     queryset = Group.objects.prefetch_related("permissions__content_type").all()
+    # Lectura anida los permisos de cada grupo
+    etag_models = (Group, Permission)
     serializer_class = GroupSerializer
-    permission_classes = [permissions.IsAuthenticated, permissions.DjangoModelPermissions]
+    permission_classes = [permissions.IsAuthenticated, CachedDjangoModelPermissions]
 
 
 @extend_schema(tags=['Permissions'])
-class PermissionViewSet(viewsets.ReadOnlyModelViewSet):
+class PermissionViewSet(SharedPermissionInstancesMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet de solo lectura para catálogo de permisos.
     
@@ -134,33 +163,25 @@ class PermissionViewSet(viewsets.ReadOnlyModelViewSet):
     - Actualización: Usuarios con permiso change_permission
     - Eliminación: Usuarios con permiso delete_permission
     """
-    queryset = Permission.objects.select_related("content_type").all().order_by("content_type__app_label", "codename")
+    queryset = Permission.objects.all().order_by("content_type__app_label", "codename")
     permission_classes = [permissions.IsAuthenticated]
 
+    def get_queryset(self):
+        # Filtrar aquí para que el COUNT de la paginación use el mismo plan filtrado
+        return super().get_queryset().filter(content_type__app_label="inventory")
+
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset().filter(content_type__app_label="inventory")
-        page = self.paginate_queryset(queryset)
+        # El catálogo solo cambia con migraciones; se cachea completo y se pagina en memoria
+        data = cache.get_or_set(
+            PERMISSION_CATALOG_CACHE_KEY,
+            self._build_catalog,
+            PERMISSION_CATALOG_CACHE_TTL,
+        )
+        page = self.paginate_queryset(data)
         if page is not None:
-            data = [
-                {
-                    "id": perm.id,
-                    "name": perm.name,
-                    "codename": perm.codename,
-                    "content_type": perm.content_type_id,
-                    "content_type_name": perm.content_type.model,
-                }
-                for perm in page
-            ]
-            return self.get_paginated_response(data)
-
-        data = [
-            {
-                "id": perm.id,
-                "name": perm.name,
-                "codename": perm.codename,
-                "content_type": perm.content_type_id,
-                "content_type_name": perm.content_type.model,
-            }
-            for perm in queryset
-        ]
+            return self.get_paginated_response(page)
         return Response(data)
+
+    def _build_catalog(self):
+        # Dicts armados en la BD o desde values(), sin instanciar Permission ni ContentType
+        return build_permission_catalog(self.get_queryset())